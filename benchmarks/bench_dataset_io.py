@@ -0,0 +1,96 @@
+"""
+Benchmark of loading the results dataset from the typed Parquet copy against
+re-parsing the CSV as the stages used to (pd.read_csv + pd.to_datetime), and of
+the normalized tables (clinvar_tables.py) against the flat Parquet copy: size on
+disk, load time and memory of the tables and of the flat view rebuilt from them.
+--fanout N reports every genomic-level variant (CNVs) under N more genes, as
+large CNVs are once the panels cover their neighbouring genes.
+
+Usage: python benchmarks/bench_dataset_io.py [--scale N ...] [--fanout N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from clinvar_tables import flat_view, read_results, read_tables, write_results
+from dataset_io import PARQUET_AVAILABLE, apply_schema, read_dataset, write_dataset
+from synthetic_data import synthetic_results
+
+def read_csv_legacy(path):
+    df = pd.read_csv(path)
+    df['Date Created'] = pd.to_datetime(df['Date Created'])
+    return df
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+def disk_mb(path):
+    if os.path.isdir(path):
+        return sum(disk_mb(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) / (1024 * 1024)
+
+def fan_out(df, extra_genes):
+    """Rows of genomic-level variants (not named after a transcript) repeated under `extra_genes` more genes."""
+    cnv = df[~df['Variant (HGVS)'].str.startswith("NM_", na=False)]
+    copies = [df] + [cnv.assign(Gene=f"NEIGHBOUR{i}") for i in range(1, extra_genes + 1)]
+    return apply_schema(pd.concat(copies, ignore_index=True))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=os.path.join(BASE_DIR, "cache", "clinvar_results"),
+                        help="Dataset path without extension (default: cache/clinvar_results)")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help="Multiples of the input rows to benchmark (default: 1 10 100)")
+    parser.add_argument("--fanout", type=int, default=0,
+                        help="Extra genes each genomic-level variant is reported under (default: 0)")
+    args = parser.parse_args()
+
+    if not PARQUET_AVAILABLE:
+        print("pyarrow is not installed, nothing to compare.")
+        return []
+
+    base = read_results(args.input)
+    if args.fanout:
+        base = fan_out(base, args.fanout)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scale:
+            path = os.path.join(tmp_dir, f"results_x{scale}")
+            # Distinct accessions in each copy, so that the tables do not merge the copies
+            write_dataset(synthetic_results(base, scale), path)
+            csv_df, csv_time = timed(read_csv_legacy, path + ".csv")
+            parquet_df, parquet_time = timed(read_dataset, path)
+            # Measured first, as write_results replaces the flat copy with the tables
+            parquet_disk = disk_mb(path + ".parquet")
+            write_results(parquet_df, path, csv=False)
+            tables, tables_time = timed(read_tables, path)
+            flat_df, flat_time = timed(flat_view, tables)
+            tables_mb = sum(memory_mb(table) for table in tables.values())
+            results.append({"rows": len(parquet_df), "csv_s": round(csv_time, 4),
+                            "parquet_s": round(parquet_time, 4), "tables_s": round(tables_time, 4),
+                            "flat_view_s": round(flat_time, 4),
+                            "csv_mb": round(memory_mb(csv_df), 1), "parquet_mb": round(memory_mb(parquet_df), 1),
+                            "tables_mb": round(tables_mb, 1),
+                            "parquet_disk_mb": round(parquet_disk, 2),
+                            "tables_disk_mb": round(disk_mb(path), 2)})
+            print(f"{len(parquet_df):>9} rows: csv {csv_time:.3f}s / {memory_mb(csv_df):.1f} MB, "
+                  f"parquet {parquet_time:.3f}s / {memory_mb(parquet_df):.1f} MB "
+                  f"({csv_time / parquet_time:.1f}x faster)")
+            print(f"{'':>15} tables {tables_time:.3f}s / {tables_mb:.1f} MB (flat view +{flat_time:.3f}s), "
+                  f"on disk {disk_mb(path):.2f} MB vs {parquet_disk:.2f} MB flat")
+    return results
+
+if __name__ == "__main__":
+    main()
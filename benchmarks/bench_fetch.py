@@ -0,0 +1,72 @@
+"""
+End-to-end fetch benchmark against the local E-utilities stand-in (mock_server.py):
+runs fetch_all for all configured genes with injected latency and faults and reports
+throughput, retries and genes lost to errors.
+
+Usage: python benchmarks/bench_fetch.py [--workers N ...] [--latency S] [--error-rate P] ...
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+import fetch_clinvar_data
+from http_client import RateLimiter, client
+from mock_server import EUTILS_PATH, add_fault_arguments, start_server, state_from_args
+
+def run(args, workers):
+    state = state_from_args(args)
+    server = start_server(state)
+    try:
+        fetch_clinvar_data.configure(None, None, server.url + EUTILS_PATH)
+        fetch_clinvar_data.rate_limiter = RateLimiter(args.client_rate)
+        client.stats = {}
+        failed = set()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = list(fetch_clinvar_data.fetch_all(fetch_clinvar_data.GENES, workers=workers,
+                                                     use_history=not args.no_history, failed=failed))
+        seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+    http = client.report()
+    return {
+        "workers": workers, "rows": len(rows), "seconds": round(seconds, 3),
+        "rows_per_s": round(len(rows) / seconds, 1),
+        "requests": sum(s["requests"] for s in http.values()),
+        "retries": sum(s["retries"] for s in http.values()),
+        "failed_genes": sorted(failed), "server": state.stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4],
+                        help="Worker counts to benchmark (default: 1 4)")
+    parser.add_argument("--client-rate", type=float, default=fetch_clinvar_data.RATE_LIMIT_WITH_KEY,
+                        help="Client request rate limit in req/s (default: the API key rate)")
+    parser.add_argument("--no-history", action="store_true", help="Use the esearch + esummary + efetch path")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        result = run(args, workers)
+        results.append(result)
+        print(f"{workers:>3} workers: {result['rows']} rows in {result['seconds']:.2f}s "
+              f"({result['rows_per_s']:.0f} rows/s), {result['requests']} requests, "
+              f"{result['retries']} retries, failed genes: {', '.join(result['failed_genes']) or 'none'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+if __name__ == "__main__":
+    main()
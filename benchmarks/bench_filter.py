@@ -0,0 +1,93 @@
+"""
+Benchmark of filter_clinvar_data.filter_frame against the previous per-row
+iterrows implementation. Checks that both produce identical outputs.
+
+Usage: python benchmarks/bench_filter.py [--scale N ...]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from filter_clinvar_data import filter_frame, parse_variant_size
+
+def filter_frame_iterrows(df, size_limit, exclude_keywords):
+    """The original row-by-row filter loop, kept as the reference implementation."""
+    df = df.copy()
+    df['Date Created'] = pd.to_datetime(df['Date Created'])
+    
+    filtered_rows = []
+    rejected_rows = []
+    
+    for _, row in df.iterrows():
+        row_dict = row.to_dict()
+        
+        name = str(row_dict.get('Variant (HGVS)', ''))
+        phenotype = str(row_dict.get('Phenotype', ''))
+        sub_date = row_dict.get('Date Created')
+        
+        reason = None
+        size = parse_variant_size(name)
+        row_dict['Estimated Size'] = size
+        
+        if hasattr(sub_date, 'year') and sub_date.year not in [2022, 2023, 2024, 2025]:
+            reason = f"Date out of range: {sub_date.year}"
+        
+        if not reason and size > size_limit:
+            reason = f"Large Genomic Event (>500kb): {size} bp"
+            
+        if not reason:
+            for keyword in exclude_keywords:
+                if keyword in phenotype:
+                    reason = f"Syndrome Phenotype: {keyword}"
+                    break
+            
+        if reason:
+            row_dict['Rejection Reason'] = reason
+            rejected_rows.append(row_dict)
+        else:
+            filtered_rows.append(row_dict)
+        
+    return pd.DataFrame(filtered_rows), pd.DataFrame(rejected_rows)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=os.path.join(BASE_DIR, "cache", "clinvar_results.csv"))
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10],
+                        help="Multiples of the input rows to benchmark (default: 1 10)")
+    args = parser.parse_args()
+    
+    with open(os.path.join(BASE_DIR, "config", "filtering.json")) as f:
+        config = json.load(f)
+    size_limit = config.get("size_limit", 500000)
+    keywords = config.get("exclude_keywords", [])
+    
+    base = pd.read_csv(args.input)
+    results = []
+    for scale in args.scale:
+        df = pd.concat([base] * scale, ignore_index=True)
+        (old_kept, old_rejected), old_time = timed(filter_frame_iterrows, df, size_limit, keywords)
+        (new_kept, new_rejected), new_time = timed(filter_frame, df, size_limit, keywords)
+        # Compare the columns both implementations produce
+        identical = (old_kept.to_csv(index=False) == new_kept[old_kept.columns].to_csv(index=False)
+                     and old_rejected.to_csv(index=False) == new_rejected[old_rejected.columns].to_csv(index=False))
+        results.append({"rows": len(df), "iterrows_s": round(old_time, 4),
+                        "vectorized_s": round(new_time, 4), "speedup": round(old_time / new_time, 1),
+                        "identical": identical})
+        print(f"{len(df):>9} rows: iterrows {old_time:.3f}s, vectorized {new_time:.3f}s "
+              f"({old_time / new_time:.1f}x), identical outputs: {identical}")
+    return results
+
+if __name__ == "__main__":
+    main()
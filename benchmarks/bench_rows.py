@@ -0,0 +1,114 @@
+"""
+Micro-benchmark of the fetch row representation: rows parsed from synthetic VCV
+XML as Row tuples with interned values, written by write_rows, against the dicts
+the fetch used to build (a string per parsed value, nothing interned) written one
+at a time through csv.DictWriter. Reports rows/s of the CSV write and the bytes
+held per row (the rows and every distinct object they reference).
+
+Usage: python benchmarks/bench_rows.py [--scale N ...]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from dataset_io import read_csv
+from fetch_clinvar_data import FIELDNAMES, parse_vcv_xml, write_rows
+from synthetic_data import DEFAULT_INPUT, synthetic_results, vcv_xml
+
+# Columns parsed once per variant and once per submission (shared by the rows of
+# one VariationArchive or ClinicalAssertion); the phenotype is parsed for each row
+VARIANT_FIELDS = ["Variant (HGVS)", "Consequence", "Variation ID", "VCV Accession"]
+SUBMISSION_FIELDS = ["Classification", "Date Created", "Submitter", "Review Status",
+                     "Submission Accession", "Submission Version"]
+
+def fresh(value):
+    """A string of its own with the text of value, as the XML parser returns."""
+    return (value + " ")[:-1] if value else value
+
+def legacy_rows(rows):
+    """The rows as the dicts parse_archive used to yield for them."""
+    legacy = []
+    variant = submission = None
+    for row in rows:
+        if row.vcv_accession != variant:
+            variant, variant_values = row.vcv_accession, {}
+        if (variant, row.submission_accession) != submission:
+            submission, submission_values = (variant, row.submission_accession), {}
+        values = {}
+        for field, value in zip(FIELDNAMES, row):
+            if field in VARIANT_FIELDS:
+                value = variant_values.setdefault(field, fresh(value))
+            elif field in SUBMISSION_FIELDS:
+                value = submission_values.setdefault(field, fresh(value))
+            elif field == "Phenotype":
+                value = fresh(value)
+            values[field] = value
+        legacy.append(values)
+    return legacy
+
+def write_legacy(f, rows):
+    writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+def held_bytes(rows):
+    """Size of the rows and of every distinct object they reference, each counted once."""
+    seen = set()
+    total = 0
+    for row in rows:
+        objects = [row, *row.keys(), *row.values()] if isinstance(row, dict) else [row, *row]
+        for obj in objects:
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+    return total
+
+def timed_write(write, rows, repeat):
+    """Best time of `repeat` writes of the rows to an in-memory CSV."""
+    times = []
+    for _ in range(repeat):
+        f = io.StringIO(newline="")
+        start = time.perf_counter()
+        write(f, rows)
+        times.append(time.perf_counter() - start)
+    return min(times), f.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=DEFAULT_INPUT)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help="Multiples of the input rows to benchmark (default: 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each write, the best is kept (default: 5)")
+    args = parser.parse_args()
+
+    base = read_csv(args.input)
+    results = []
+    for scale in args.scale:
+        synthetic = synthetic_results(base, scale)
+        rows = [row for gene, group in synthetic.groupby('Gene', sort=False, observed=True)
+                for row in parse_vcv_xml(vcv_xml(group), str(gene))]
+        legacy = legacy_rows(rows)
+        legacy_time, legacy_csv = timed_write(write_legacy, legacy, args.repeat)
+        rows_time, rows_csv = timed_write(write_rows, rows, args.repeat)
+        assert rows_csv == legacy_csv, "write_rows output differs from csv.DictWriter"
+        legacy_bytes, rows_bytes = held_bytes(legacy) / len(rows), held_bytes(rows) / len(rows)
+        results.append({"rows": len(rows), "dict_rows_per_s": round(len(rows) / legacy_time),
+                        "tuple_rows_per_s": round(len(rows) / rows_time),
+                        "dict_bytes_per_row": round(legacy_bytes), "tuple_bytes_per_row": round(rows_bytes)})
+        print(f"{len(rows):>9} rows: dict {len(rows) / legacy_time:,.0f} rows/s / {legacy_bytes:,.0f} B/row, "
+              f"tuple {len(rows) / rows_time:,.0f} rows/s / {rows_bytes:,.0f} B/row "
+              f"({legacy_time / rows_time:.1f}x faster, {legacy_bytes / rows_bytes:.1f}x smaller)")
+    return results
+
+if __name__ == "__main__":
+    main()
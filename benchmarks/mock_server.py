@@ -0,0 +1,296 @@
+"""
+Local stand-in for the NCBI E-utilities (esearch/esummary/efetch on ClinVar) and
+CrossRef (/works/{doi} and /works?filter=doi:...) endpoints used by the fetchers, served from synthetic
+fixtures (see synthetic_data.py). Latency, rate limiting (429), 5xx errors and
+truncated efetch XML can be injected to test throughput and failure handling.
+
+Usage: python benchmarks/mock_server.py [--port 8765] [--scale N] [--latency S]
+           [--rate-limit N] [--error-rate P] [--truncate-rate P]
+Then point the fetchers at it:
+    python src/fetch_clinvar_data.py --base-url http://127.0.0.1:8765/entrez/eutils/ --no-cache
+    python src/fetch_bibliography.py --base-url http://127.0.0.1:8765
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from dataset_io import read_csv
+from synthetic_data import DEFAULT_INPUT, archive_xml, synthetic_results, variant_rows
+
+EUTILS_PATH = "/entrez/eutils/"
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<ClinVarResult-Set>\n'
+XML_FOOTER = "</ClinVarResult-Set>\n"
+ERROR_STATUSES = [500, 502, 503]
+
+class MockState:
+    """Fixtures, History server sessions, fault settings and request counters."""
+
+    def __init__(self, results, latency=0.0, jitter=0.0, rate_limit=None, error_rate=0.0,
+                 truncate_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        # Fixtures: the rows and genes of each variant and Variation IDs per gene (in release order)
+        self.rows_by_id, self.genes_by_id = variant_rows(results)
+        self.ids_by_gene = {}
+        for variation_id, genes in self.genes_by_id.items():
+            for gene in genes:
+                self.ids_by_gene.setdefault(str(gene), []).append(variation_id)
+        self.id_by_accession = {rows[0]['VCV Accession']: i for i, rows in self.rows_by_id.items()}
+        # Modification date of a variant: its most recent submission
+        self.modified = {i: max((r['Date Created'] for r in rows if not pd.isna(r['Date Created'])),
+                                default=pd.Timestamp.min) for i, rows in self.rows_by_id.items()}
+
+        self.history = {}  # WebEnv -> list of result sets (query_key = index + 1)
+        self.tokens = float(rate_limit or 0)
+        self.last = time.monotonic()
+        self.stats = {"requests": {}, "rate_limited": 0, "errors": 0, "truncated": 0}
+
+    def count(self, key, endpoint=None):
+        with self.lock:
+            if endpoint is None:
+                self.stats[key] += 1
+            else:
+                self.stats[key][endpoint] = self.stats[key].get(endpoint, 0) + 1
+
+    def chance(self, probability):
+        with self.lock:
+            return probability > 0 and self.random.random() < probability
+
+    def admit(self):
+        """Token bucket of the simulated rate limit; False if the request gets a 429."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.last) * self.rate_limit)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self.lock:
+                extra = self.random.uniform(0, self.jitter)
+            time.sleep(self.latency + extra)
+
+    def store_history(self, webenv, ids):
+        """Keep a result set on the simulated History server; returns (webenv, query_key)."""
+        with self.lock:
+            webenv = webenv or f"MCID_{uuid.uuid4().hex}"
+            sets = self.history.setdefault(webenv, [])
+            sets.append(ids)
+            return webenv, str(len(sets))
+
+    def history_ids(self, webenv, query_key):
+        with self.lock:
+            sets = self.history.get(webenv)
+            index = int(str(query_key).lstrip("#")) - 1
+            if sets is None or not 0 <= index < len(sets):
+                return None
+            return sets[index]
+
+    def search(self, params):
+        """IDs matching an esearch request (gene term, optional mdat window or #query_key)."""
+        term = params.get("term", "")
+        if term.startswith("#"):
+            return self.history_ids(params.get("WebEnv"), term)
+        ids = self.ids_by_gene.get(term.split("[")[0].strip(), [])
+        if params.get("mindate"):
+            start = pd.Timestamp(params["mindate"].replace("/", "-"))
+            end = pd.Timestamp(params.get("maxdate", "3000/01/01").replace("/", "-"))
+            ids = [i for i in ids if start <= self.modified[i] <= end]
+        return ids
+
+    def efetch_ids(self, params):
+        """Variation IDs requested by an efetch (id list or History server page)."""
+        if params.get("WebEnv"):
+            ids = self.history_ids(params["WebEnv"], params.get("query_key", "1"))
+            if ids is None:
+                return None
+            start = int(params.get("retstart", 0))
+            return ids[start:start + int(params.get("retmax", 20))]
+        ids = [i for i in params.get("id", "").split(",") if i]
+        if params.get("is_variationid") == "true":
+            return [int(i) for i in ids if i.isdigit() and int(i) in self.rows_by_id]
+        return [self.id_by_accession[i] for i in ids if i in self.id_by_accession]
+
+def crossref_message(doi):
+    """Synthetic CrossRef work record of a DOI."""
+    return {
+        "DOI": doi,
+        "title": [f"Synthetic article <i>{doi}</i>"],
+        "container-title": ["Journal of Synthetic Genetics"],
+        "published-print": {"date-parts": [[2000 + sum(map(ord, doi)) % 25]]},
+        "author": [{"family": "Kowalska", "given": "Anna"}, {"family": "Nowak", "given": "Jan"}],
+    }
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status, body, content_type, headers=None):
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, status, data, headers=None):
+            self.send_body(status, json.dumps(data), "application/json", headers)
+
+        def params(self):
+            query = urlsplit(self.path).query
+            if self.command == "POST":
+                length = int(self.headers.get("Content-Length", 0))
+                query = self.rfile.read(length).decode("utf-8")
+            return {key: values[-1] for key, values in parse_qs(query).items()}
+
+        def do_GET(self):
+            self.dispatch()
+
+        def do_POST(self):
+            self.dispatch()
+
+        def dispatch(self):
+            path = urlsplit(self.path).path
+            params = self.params()
+            if path == "/_stats":
+                with state.lock:
+                    return self.send_json(200, state.stats)
+
+            endpoint = path[len(EUTILS_PATH):] if path.startswith(EUTILS_PATH) else path.split("/")[1]
+            state.count("requests", endpoint)
+            state.delay()
+            if not state.admit():
+                state.count("rate_limited")
+                return self.send_json(429, {"error": "API rate limit exceeded"}, {"Retry-After": "1"})
+            if state.chance(state.error_rate):
+                state.count("errors")
+                return self.send_body(state.random.choice(ERROR_STATUSES), "Injected server error", "text/plain")
+
+            if endpoint == "esearch.fcgi":
+                self.esearch(params)
+            elif endpoint == "esummary.fcgi":
+                self.esummary(params)
+            elif endpoint == "efetch.fcgi":
+                self.efetch(params)
+            elif path.startswith("/works/"):
+                doi = unquote(path[len("/works/"):])
+                self.send_json(200, {"status": "ok", "message-type": "work", "message": crossref_message(doi)})
+            elif path == "/works":
+                self.works(params)
+            else:
+                self.send_body(404, "Not found", "text/plain")
+
+        def esearch(self, params):
+            ids = state.search(params)
+            if ids is None:
+                return self.send_json(200, {"esearchresult": {"ERROR": "Invalid query_key or WebEnv"}})
+            start, retmax = int(params.get("retstart", 0)), int(params.get("retmax", 20))
+            result = {"count": str(len(ids)), "retmax": str(min(retmax, 10000)), "retstart": str(start),
+                      "idlist": [str(i) for i in ids[start:start + min(retmax, 10000)]]}
+            if params.get("usehistory") == "y":
+                if params.get("term", "").startswith("#"):
+                    result["webenv"], result["querykey"] = params["WebEnv"], params["term"][1:]
+                else:
+                    result["webenv"], result["querykey"] = state.store_history(params.get("WebEnv"), ids)
+            self.send_json(200, {"header": {"type": "esearch", "version": "0.3"}, "esearchresult": result})
+
+        def esummary(self, params):
+            ids = [i for i in params.get("id", "").split(",") if i.isdigit() and int(i) in state.rows_by_id]
+            result = {"uids": ids}
+            for i in ids:
+                result[i] = {"uid": i, "accession": state.rows_by_id[int(i)][0]['VCV Accession']}
+            self.send_json(200, {"header": {"type": "esummary", "version": "0.3"}, "result": result})
+
+        def works(self, params):
+            """CrossRef work list; only the doi: filter is supported."""
+            dois = [value[len("doi:"):] for value in params.get("filter", "").split(",") if value.startswith("doi:")]
+            items = [crossref_message(doi.lower()) for doi in dois][:int(params.get("rows", 20))]
+            self.send_json(200, {"status": "ok", "message-type": "work-list",
+                                 "message": {"total-results": len(items), "items": items}})
+
+        def efetch(self, params):
+            ids = state.efetch_ids(params)
+            if ids is None:
+                return self.send_body(400, "Invalid WebEnv or query_key", "text/plain")
+            body = (XML_HEADER + "".join(archive_xml(i, state.rows_by_id[i], state.genes_by_id[i]) + "\n" for i in ids)
+                    + XML_FOOTER).encode("utf-8")
+            if state.chance(state.truncate_rate):
+                state.count("truncated")
+                body = body[:state.random.randint(len(body) // 10, len(body) * 9 // 10)]
+            self.send_body(200, body, "text/xml")
+
+    return Handler
+
+def start_server(state, host="127.0.0.1", port=0):
+    """Serve in a background thread. Returns the server; its URL root is server.url."""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_fault_arguments(parser):
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Multiple of cache/clinvar_results.csv served as fixtures (default: 1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument("--rate-limit", type=float, help="Requests per second before answering 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 5xx")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Share of efetch bodies cut short")
+    parser.add_argument("--seed", type=int, default=0)
+
+def state_from_args(args):
+    results = synthetic_results(read_csv(DEFAULT_INPUT), args.scale)
+    return MockState(results, latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                     error_rate=args.error_rate, truncate_rate=args.truncate_rate, seed=args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    state = state_from_args(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"Serving {len(state.rows_by_id)} variants of {len(state.ids_by_gene)} genes")
+    print(f"  E-utilities: http://{args.host}:{args.port}{EUTILS_PATH}")
+    print(f"  CrossRef:    http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(state.stats, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark suite of the pipeline hot paths on synthetic data (see synthetic_data.py)
+at multiples of the real dataset. Each benchmark is timed (best of --repeat runs)
+and memory-profiled (peak traced allocations of one extra run). Results are written
+as JSON, and --compare prints the change against an earlier results file.
+
+Usage: python benchmarks/run_benchmarks.py [--scale N ...] [--only NAME ...] [--compare OLD.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from dataset_io import read_csv, write_dataset
+from fetch_clinvar_data import compare_results, parse_vcv_xml, write_rows
+from filter_clinvar_data import filter_variants, load_config, parse_variant_size, variant_sizes
+from generate_impact_report import render_charts
+from generate_latex_report import render_latex
+from synthetic_data import DEFAULT_INPUT, synthetic_results, vcv_xml
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+REGRESSION_THRESHOLD = 1.2  # Slowdown ratio reported as a regression
+
+def prepare(base, scale, work_dir):
+    """Synthetic inputs of every benchmark at the given scale."""
+    results = synthetic_results(base, scale)
+    config = load_config(os.path.join(BASE_DIR, "config", "filtering.json"))
+    kept, rejected = filter_variants(results, config)
+
+    # VCV XML as efetch would return it, one document per gene
+    xml_by_gene = [(str(gene), vcv_xml(group))
+                   for gene, group in results.groupby('Gene', sort=False, observed=True)]
+
+    # compare_results: the previous run lacks 1% of the variants
+    old_path = os.path.join(work_dir, "old")
+    new_path = os.path.join(work_dir, "new")
+    write_dataset(results.drop(results.index[::100]), old_path)
+    write_dataset(results, new_path)
+
+    # render_latex reads the bibliography from the cache dir, so no DOI is fetched
+    cache_dir = os.path.join(work_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    shutil.copy(os.path.join(BASE_DIR, "cache", "bibliography_cache.json"), cache_dir)
+
+    return {
+        "rows": len(results), "results": results, "config": config, "kept": kept, "rejected": rejected,
+        "xml_by_gene": xml_by_gene,
+        "parsed_rows": [row for gene, xml in xml_by_gene for row in parse_vcv_xml(xml, gene)],
+        "names": results['Variant (HGVS)'].tolist(),
+        "old_csv": old_path + ".csv", "new_csv": new_path + ".csv",
+        "work_dir": work_dir, "cache_dir": cache_dir,
+    }
+
+def bench_parse_vcv_xml(data):
+    return sum(len(list(parse_vcv_xml(xml, gene))) for gene, xml in data["xml_by_gene"])
+
+def bench_write_rows(data):
+    return write_rows(io.StringIO(newline=""), data["parsed_rows"])
+
+def bench_parse_variant_size(data):
+    return [parse_variant_size(name) for name in data["names"]]
+
+def bench_variant_sizes(data):
+    return variant_sizes(data["results"]['Variant (HGVS)'])
+
+def bench_filter_data(data):
+    return filter_variants(data["results"], data["config"])
+
+def bench_compare_results(data):
+    return compare_results(data["old_csv"], data["new_csv"], os.path.join(data["work_dir"], "changes"))
+
+def bench_charts(data):
+    return render_charts(data["kept"], os.path.join(data["work_dir"], "charts"), force=True)
+
+def bench_charts_cached(data):
+    # Unchanged aggregates: after the first run no chart is redrawn
+    return render_charts(data["kept"], os.path.join(data["work_dir"], "charts"))
+
+def bench_generate_latex(data):
+    return render_latex(data["kept"], data["rejected"], os.path.join(BASE_DIR, "config"),
+                        data["cache_dir"], os.path.join(data["work_dir"], "report.tex"), fragment_cache=False)
+
+def bench_generate_latex_cached(data):
+    # Unchanged inputs: after the first run every section comes from the fragment cache
+    return render_latex(data["kept"], data["rejected"], os.path.join(BASE_DIR, "config"),
+                        data["cache_dir"], os.path.join(data["work_dir"], "report.tex"))
+
+BENCHMARKS = {
+    "parse_vcv_xml": bench_parse_vcv_xml,
+    "write_rows": bench_write_rows,
+    "parse_variant_size": bench_parse_variant_size,
+    "variant_sizes": bench_variant_sizes,
+    "filter_data": bench_filter_data,
+    "compare_results": bench_compare_results,
+    "charts": bench_charts,
+    "charts_cached": bench_charts_cached,
+    "generate_latex": bench_generate_latex,
+    "generate_latex_cached": bench_generate_latex_cached,
+}
+
+def measure(func, data, repeat):
+    """Best wall time over `repeat` runs and peak traced memory (MB) of one more run."""
+    times = []
+    # Stage output (progress and diff listings) would drown the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(data)
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        func(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return min(times), peak / (1024 * 1024)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """Print the time ratio of every benchmark present in both result files."""
+    old_times = {(r["benchmark"], r["scale"]): r["seconds"] for r in old["results"]}
+    print(f"\nChange against {old.get('commit', '?')} (new / old time):")
+    regressions = 0
+    for result in new["results"]:
+        key = (result["benchmark"], result["scale"])
+        if key not in old_times or not old_times[key]:
+            continue
+        ratio = result["seconds"] / old_times[key]
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"  {key[0]:>20} x{key[1]:<5} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Real results CSV to resample")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help="Multiples of the input rows (default: 1 10 100; 1000 takes long)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (default: 3)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    names = args.only or list(BENCHMARKS)
+    base = read_csv(args.input)
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": [],
+    }
+
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as work_dir:
+            data = prepare(base, scale, work_dir)
+            for name in names:
+                seconds, peak_mb = measure(BENCHMARKS[name], data, args.repeat)
+                report["results"].append({"benchmark": name, "scale": scale, "rows": data["rows"],
+                                          "seconds": round(seconds, 4), "peak_mb": round(peak_mb, 1)})
+                print(f"{name:>20} x{scale:<5} {data['rows']:>9} rows: {seconds:8.3f}s, peak {peak_mb:8.1f} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
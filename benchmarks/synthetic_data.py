@@ -0,0 +1,129 @@
+"""
+Synthetic ClinVar data for benchmarks: results tables and matching VCV XML at
+multiples of the real dataset. Rows are resampled from cache/clinvar_results.csv,
+so names, phenotypes and submitters keep their real distributions, while every
+copy gets its own Variation ID and VCV/SCV accessions.
+
+Usage: python benchmarks/synthetic_data.py --scale N [--output DIR]
+"""
+import argparse
+import os
+import sys
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from dataset_io import read_csv
+
+DEFAULT_INPUT = os.path.join(BASE_DIR, "cache", "clinvar_results.csv")
+
+def synthetic_results(base, scale, seed=0):
+    """
+    `scale` copies of the results DataFrame `base`. Copies after the first get new
+    Variation IDs and accessions, and their creation dates are shifted by up to a
+    year per submission, so they behave as distinct variants and submissions.
+    """
+    rng = np.random.default_rng(seed)
+    id_span = int(base['Variation ID'].max()) + 1
+    copies = []
+    for copy in range(scale):
+        df = base.copy()
+        if copy:
+            df['Variation ID'] = df['Variation ID'] + copy * id_span
+            df['VCV Accession'] = "VCV" + df['Variation ID'].astype(str).str.zfill(9)
+            scv_number = df['Submission Accession'].str[3:].astype(np.int64) + copy * 10 ** 9
+            df['Submission Accession'] = "SCV" + scv_number.astype(str).str.zfill(9)
+            # One shift per submission, whose phenotype rows share the date
+            submissions = pd.factorize(df['Submission Accession'])[0]
+            shift = pd.to_timedelta(rng.integers(-182, 183, submissions.max() + 1)[submissions], unit="D")
+            df['Date Created'] = df['Date Created'] + shift
+        copies.append(df)
+    return pd.concat(copies, ignore_index=True)
+
+def archive_xml(variation_id, rows, genes=None):
+    """
+    VariationArchive element (as returned by efetch) holding the row dicts of one
+    variant; `genes` lists its gene symbols (default: the gene of the rows).
+    """
+    first = rows[0]
+    gene_list = "".join(f'<Gene Symbol={quoteattr(str(gene))}/>' for gene in genes or [first["Gene"]])
+    parts = [f'<VariationArchive VariationID="{variation_id}" Accession="{first["VCV Accession"]}" Version="1">',
+             "<ClassifiedRecord><SimpleAllele>",
+             f'<GeneList>{gene_list}</GeneList>',
+             f'<Name>{escape(str(first["Variant (HGVS)"]))}</Name>']
+    if not pd.isna(first["Consequence"]) and first["Consequence"] != "N/A":
+        parts.append(f'<HGVSlist><HGVS><MolecularConsequence Type={quoteattr(str(first["Consequence"]))}/></HGVS></HGVSlist>')
+    parts.append("</SimpleAllele><ClinicalAssertionList>")
+    submissions = {}
+    for row in rows:
+        submissions.setdefault(row['Submission Accession'], []).append(row)
+    for accession, submission in submissions.items():
+        row = submission[0]
+        date = row['Date Created'].strftime("%Y-%m-%d") if not pd.isna(row['Date Created']) else ""
+        parts.append(f'<ClinicalAssertion><ClinVarAccession Accession="{accession}" Version="1" '
+                     f'SubmitterName={quoteattr(str(row["Submitter"]))} DateCreated="{date}"/>'
+                     f'<Classification><ReviewStatus>{escape(str(row["Review Status"]))}</ReviewStatus>'
+                     f'<GermlineClassification>{escape(str(row["Classification"]))}</GermlineClassification>'
+                     '</Classification><TraitSet>')
+        for phenotype_row in submission:
+            phenotype = phenotype_row['Phenotype']
+            if phenotype != "Not Provided":
+                parts.append(f'<Trait><Name><ElementValue Type="Preferred">{escape(str(phenotype))}</ElementValue></Name></Trait>')
+        parts.append("</TraitSet></ClinicalAssertion>")
+    parts.append("</ClinicalAssertionList></ClassifiedRecord></VariationArchive>")
+    return "".join(parts)
+
+def variant_rows(results):
+    """
+    Row dicts of every variant and its gene symbols. A variant in several genes is
+    listed under each of them with the same submissions; its rows are taken from
+    the first gene.
+    """
+    archives, genes = {}, {}
+    for row in results.to_dict("records"):
+        variation_id = int(row['Variation ID'])
+        gene_list = genes.setdefault(variation_id, [])
+        if row['Gene'] not in gene_list:
+            gene_list.append(row['Gene'])
+        if gene_list[0] == row['Gene']:
+            archives.setdefault(variation_id, []).append(row)
+    return archives, genes
+
+def vcv_xml(results):
+    """
+    efetch-style VCV XML document (bytes) for the rows of a results DataFrame;
+    parse_vcv_xml of it yields the rows again.
+    """
+    archives, genes = variant_rows(results)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<ClinVarResult-Set>\n']
+    for variation_id, rows in archives.items():
+        parts.append(archive_xml(variation_id, rows, genes[variation_id]))
+        parts.append("\n")
+    parts.append("</ClinVarResult-Set>\n")
+    return "".join(parts).encode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=DEFAULT_INPUT)
+    parser.add_argument("--scale", type=int, default=10,
+                        help="Multiple of the input rows to generate (default: 10)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "benchmarks", "data"),
+                        help="Output directory (default: benchmarks/data)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    results = synthetic_results(read_csv(args.input), args.scale, args.seed)
+    csv_path = os.path.join(args.output, f"clinvar_results_x{args.scale}.csv")
+    xml_path = os.path.join(args.output, f"clinvar_vcv_x{args.scale}.xml")
+    results.to_csv(csv_path, index=False)
+    with open(xml_path, "wb") as f:
+        f.write(vcv_xml(results))
+    print(f"Wrote {len(results)} rows to {csv_path} and {xml_path}")
+
+if __name__ == "__main__":
+    main()
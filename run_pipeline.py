@@ -0,0 +1,353 @@
+"""
+Incremental pipeline runner. Each stage declares its input and output files;
+a stage is rerun only when the content of one of its inputs changed since its
+last successful run, or when one of its outputs is missing or was modified.
+Independent stages run in parallel. The inputs of a stage include its script
+and every module of src/ the script imports, and the pdf stage depends on all
+the charts drawn by src/generate_impact_report.py. The fetch stage downloads
+ClinVar data, which changes independently of local files, but it reruns only
+with --force fetch (or a changed input), so report edits never touch the network.
+
+Every run writes cache/metrics/run-<date>.json with the wall time, CPU time and
+peak RSS of each stage process, merged with the per-stage metrics (rows, HTTP
+statistics) that the scripts in src/ record themselves.
+
+Usage: python3 run_pipeline.py [--jobs N] [--force STAGE ...] [--skip STAGE ...] [--dry-run]
+                               [--profile STAGE]
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "cache/pipeline_state.json"
+METRICS_DIR = "cache/metrics"
+# Read by src/metrics.py in the stage processes
+METRICS_DIR_ENV = "PIPELINE_METRICS_DIR"
+PROFILE_ENV = "PIPELINE_PROFILE_STAGE"
+SRC_DIR = "src"
+
+TEX_FILE = "output/Raport_Wplywu_2022-2025.tex"
+
+def parse_source(path):
+    with open(os.path.join(BASE_DIR, path), "r", encoding="utf-8") as f:
+        return ast.parse(f.read(), path)
+
+def source_inputs(script):
+    """
+    The script and the modules of src/ it imports, directly or through other
+    modules (paths relative to the repository root).
+    """
+    modules, todo = set(), [script]
+    while todo:
+        path = todo.pop()
+        if path in modules:
+            continue
+        modules.add(path)
+        for node in ast.walk(parse_source(path)):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = f"{SRC_DIR}/{name.split('.')[0]}.py"
+                if os.path.exists(os.path.join(BASE_DIR, module)):
+                    todo.append(module)
+    return sorted(modules)
+
+def chart_files(script="src/generate_impact_report.py", output_dir="cache"):
+    """Paths of the charts the script draws (the "file" entries of its CHARTS)."""
+    files = []
+    for node in ast.walk(parse_source(script)):
+        if isinstance(node, ast.Dict):
+            for key, value in zip(node.keys, node.values):
+                if isinstance(key, ast.Constant) and key.value == "file" and isinstance(value, ast.Constant):
+                    files.append(f"{output_dir}/{value.value}")
+    return files
+
+CHART_FILES = chart_files()
+
+# Stages in declaration order; dependencies follow from inputs produced by other stages.
+# Paths are relative to the repository root.
+STAGES = [
+    {
+        "name": "fetch",
+        "commands": [[sys.executable, "src/fetch_clinvar_data.py"]],
+        "inputs": source_inputs("src/fetch_clinvar_data.py"),
+        "outputs": ["cache/clinvar_results.csv"],
+    },
+    {
+        "name": "filter",
+        "commands": [[sys.executable, "src/filter_clinvar_data.py"]],
+        "inputs": source_inputs("src/filter_clinvar_data.py") + ["config/filtering.json",
+                                                                 "cache/clinvar_results.csv"],
+        "outputs": ["cache/clinvar_filtered_2022_2025_final.csv", "cache/rejected_variants.csv"],
+    },
+    {
+        "name": "bibliography",
+        "commands": [[sys.executable, "src/fetch_bibliography.py"]],
+        "inputs": source_inputs("src/fetch_bibliography.py") + ["config/config_dois.json"],
+        "outputs": ["cache/bibliography_cache.json"],
+    },
+    {
+        "name": "charts",
+        "commands": [[sys.executable, "src/generate_impact_report.py"]],
+        "inputs": source_inputs("src/generate_impact_report.py") + ["config/config_centers.json",
+                                                                    "cache/clinvar_filtered_2022_2025_final.csv"],
+        "outputs": CHART_FILES,
+    },
+    {
+        "name": "latex",
+        "commands": [[sys.executable, "src/generate_latex_report.py"]],
+        "inputs": source_inputs("src/generate_latex_report.py") + [
+            "config/report_text.json", "config/config_centers.json", "config/config_dois.json",
+            "config/gene_omim.json", "cache/bibliography_cache.json",
+            "cache/clinvar_filtered_2022_2025_final.csv", "cache/rejected_variants.csv"],
+        "outputs": [TEX_FILE],
+    },
+    {
+        "name": "pdf",
+        # Reruns pdflatex only while the table of contents and references change
+        "commands": [[sys.executable, "src/build_pdf.py", "--tex", TEX_FILE]],
+        "inputs": source_inputs("src/build_pdf.py") + [TEX_FILE] + CHART_FILES,
+        "outputs": ["output/Raport_Wplywu_2022-2025.pdf"],
+    },
+]
+
+class FileHasher:
+    """
+    SHA-256 of file contents, reusing the hash recorded for a file whose size and
+    modification time did not change.
+    """
+
+    def __init__(self, known=None):
+        self.known = known or {}
+
+    def hash(self, path):
+        full_path = os.path.join(BASE_DIR, path)
+        if not os.path.exists(full_path):
+            return None
+        stat = os.stat(full_path)
+        entry = self.known.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        digest = hashlib.sha256()
+        with open(full_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.known[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {"files": {}, "stages": {}}
+
+def save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def stage_dependencies(stages):
+    """Map each stage name to the names of the stages producing its inputs."""
+    producers = {output: stage["name"] for stage in stages for output in stage["outputs"]}
+    return {stage["name"]: {producers[p] for p in stage["inputs"] if p in producers} - {stage["name"]}
+            for stage in stages}
+
+def fingerprint(stage, hasher):
+    """Content hashes of the stage's inputs and outputs."""
+    return ({path: hasher.hash(path) for path in stage["inputs"]},
+            {path: hasher.hash(path) for path in stage["outputs"]})
+
+def stale_reason(stage, record, hasher):
+    """Why the stage has to run, or None if it is up to date."""
+    inputs, outputs = fingerprint(stage, hasher)
+    missing = [path for path, digest in outputs.items() if digest is None]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    if record is None:
+        return "no previous run"
+    changed = [path for path, digest in inputs.items() if record["inputs"].get(path) != digest]
+    if changed:
+        return f"changed {', '.join(changed)}"
+    modified = [path for path, digest in outputs.items() if record["outputs"].get(path) != digest]
+    if modified:
+        return f"modified {', '.join(modified)}"
+    return None
+
+def run_command(command, env):
+    """
+    Run one command, returning (returncode, output, usage). usage holds the wall
+    time and, where os.wait4 is available, the CPU time and peak RSS of the process.
+    """
+    start = time.monotonic()
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True, errors="replace")
+    if not hasattr(os, "wait4"):
+        output, _ = process.communicate()
+        return process.returncode, output, {"wall_s": round(time.monotonic() - start, 3)}
+    output = process.stdout.read()
+    process.stdout.close()
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    rss_unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return process.returncode, output, {
+        "wall_s": round(time.monotonic() - start, 3),
+        "cpu_s": round(rusage.ru_utime + rusage.ru_stime, 3),
+        "peak_rss_mb": round(rusage.ru_maxrss / rss_unit, 1),
+    }
+
+def run_stage(stage, env=None):
+    """Run the stage's commands, returning (success, seconds, output, usage per command)."""
+    start = time.monotonic()
+    output, usage = [], []
+    for command in stage["commands"]:
+        try:
+            returncode, command_output, command_usage = run_command(command, env)
+        except OSError as e:
+            output.append(f"{command[0]}: {e}\n")
+            return False, time.monotonic() - start, "".join(output), usage
+        output.append(command_output)
+        usage.append(dict(command_usage, command=" ".join(command), returncode=returncode))
+        if returncode != 0:
+            return False, time.monotonic() - start, "".join(output), usage
+    return True, time.monotonic() - start, "".join(output), usage
+
+def merge_metrics(run_dir, stage_metrics):
+    """
+    Combine the process measurements of the stages with the metrics files the stage
+    scripts wrote into run_dir. Returns the path of the run's metrics file.
+    """
+    processes = {}
+    for name in sorted(os.listdir(run_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(run_dir, name)) as f:
+                processes[name[:-len(".json")]] = json.load(f)
+    path = f"{run_dir}.json"
+    with open(path, "w") as f:
+        json.dump({"run": os.path.basename(run_dir), "stages": stage_metrics, "processes": processes}, f, indent=4)
+    return path
+
+def run_pipeline(stages=STAGES, jobs=4, force=(), skip=(), dry_run=False, state_path=STATE_FILE,
+                 profile=None):
+    """
+    Run the stale stages of the pipeline. Stages in `force` always run, stages in
+    `skip` never do. `profile` names a stage whose scripts dump a cProfile profile.
+    Returns the names of the stages that failed (empty on success).
+    """
+    state_path = os.path.join(BASE_DIR, state_path)
+    run_dir = os.path.join(BASE_DIR, METRICS_DIR, f"run-{datetime.now():%Y%m%d-%H%M%S}")
+    env = dict(os.environ, **{METRICS_DIR_ENV: run_dir})
+    if profile:
+        env[PROFILE_ENV] = profile
+    stage_metrics = {}
+    state = load_state(state_path)
+    hasher = FileHasher(state["files"])
+    dependencies = stage_dependencies(stages)
+    by_name = {stage["name"]: stage for stage in stages}
+
+    pending = [stage["name"] for stage in stages]
+    done, failed, ran = set(), [], set()
+    would_run = set()  # Dry run: stages reported as stale
+    running = {}
+
+    def ready(name):
+        return dependencies[name] <= done
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while pending or running:
+            for name in [n for n in pending if ready(n)]:
+                pending.remove(name)
+                stage = by_name[name]
+                if name in skip:
+                    print(f"[{name}] skipped")
+                    done.add(name)
+                    continue
+                reason = "forced" if name in force else None
+                # Upstream stages have finished, so the inputs are final
+                if reason is None and dependencies[name] & would_run:
+                    reason = f"after {', '.join(sorted(dependencies[name] & would_run))}"
+                reason = reason or stale_reason(stage, state["stages"].get(name), hasher)
+                if reason is None:
+                    print(f"[{name}] up to date")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"[{name}] would run ({reason})")
+                    done.add(name)
+                    would_run.add(name)
+                    continue
+                print(f"[{name}] running ({reason})")
+                os.makedirs(run_dir, exist_ok=True)
+                running[executor.submit(run_stage, stage, env)] = name
+
+            # Stages blocked by a failed dependency are dropped
+            blocked = [n for n in pending if dependencies[n] & set(failed)]
+            for name in blocked:
+                pending.remove(name)
+                failed.append(name)
+                print(f"[{name}] skipped, a dependency failed")
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                success, seconds, output, usage = future.result()
+                stage_metrics[name] = {"success": success, "wall_s": round(seconds, 3), "commands": usage}
+                if success:
+                    inputs, outputs = fingerprint(by_name[name], hasher)
+                    state["stages"][name] = {"inputs": inputs, "outputs": outputs, "finished": time.time()}
+                    save_state(state_path, state)
+                    done.add(name)
+                    ran.add(name)
+                    print(f"[{name}] done in {seconds:.1f}s")
+                else:
+                    failed.append(name)
+                    print(f"[{name}] FAILED after {seconds:.1f}s:\n{output}")
+
+    if not dry_run:
+        save_state(state_path, state)
+    if stage_metrics:
+        print(f"Metrics saved to {merge_metrics(run_dir, stage_metrics)}")
+    print(f"Ran {len(ran)} of {len(stages)} stages" + (f", failed: {', '.join(failed)}" if failed else "."))
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stale stages of the report pipeline.")
+    parser.add_argument("--jobs", type=int, default=4,
+                        help="Number of stages run in parallel (default: 4)")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE",
+                        choices=[stage["name"] for stage in STAGES] + ["all"],
+                        help="Rerun the given stages even if they are up to date "
+                             "(e.g. --force fetch to refresh ClinVar data)")
+    parser.add_argument("--skip", nargs="+", default=[], metavar="STAGE",
+                        choices=[stage["name"] for stage in STAGES],
+                        help="Never run the given stages (e.g. --skip fetch to work offline)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only print which stages would run")
+    parser.add_argument("--profile", metavar="STAGE",
+                        help="Write a cProfile dump of this stage of the src/ scripts (e.g. filter, "
+                             "charts, latex) to cache/metrics/")
+    args = parser.parse_args()
+
+    force = {stage["name"] for stage in STAGES} if "all" in args.force else set(args.force)
+    os.makedirs(os.path.join(BASE_DIR, "output"), exist_ok=True)
+    failed = run_pipeline(jobs=args.jobs, force=force, skip=set(args.skip), dry_run=args.dry_run,
+                          profile=args.profile)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -9,34 +9,29 @@ if command -v uv &> /dev/null; then
     if [ ! -d ".venv" ]; then
         uv venv
     fi
-    source .venv/bin/activate
-    uv pip install -r requirements.txt
+    PIP="uv pip"
 else
     echo "uv not found, falling back to standard pip..."
-    python3 -m venv .venv
-    source .venv/bin/activate
-    pip install -r requirements.txt
+    if [ ! -d ".venv" ]; then
+        python3 -m venv .venv
+    fi
+    PIP="pip"
+fi
+source .venv/bin/activate
+
+# Reinstall dependencies only when requirements.txt changed
+REQUIREMENTS_STAMP=".venv/requirements.sha256"
+if ! sha256sum --check --status "$REQUIREMENTS_STAMP" 2> /dev/null; then
+    $PIP install -r requirements.txt
+    sha256sum requirements.txt > "$REQUIREMENTS_STAMP"
+    echo "Dependencies installed."
+else
+    echo "Dependencies up to date."
 fi
 
-echo "Dependencies installed."
-
-# Run Python scripts
-echo "Running fetch_clinvar_data.py..."
-python3 src/fetch_clinvar_data.py
-
-echo "Running filter_clinvar_data.py..."
-python3 src/filter_clinvar_data.py
-
-echo "Running generate_impact_report.py..."
-python3 src/generate_impact_report.py
-
-echo "Running generate_latex_report.py..."
-python3 src/generate_latex_report.py
-
-# Compile LaTeX
-echo "Compiling PDF..."
+# Run the stale stages (fetch, filter, bibliography, charts, LaTeX, PDF);
+# arguments are passed on, e.g. --force fetch to refresh the ClinVar data
 mkdir -p output
-pdflatex -output-directory output output/Raport_Wplywu_2022-2025.tex
-pdflatex -output-directory output output/Raport_Wplywu_2022-2025.tex
+python3 run_pipeline.py "$@"
 
 echo "Pipeline completed successfully. Report available at output/Raport_Wplywu_2022-2025.pdf"
@@ -0,0 +1,123 @@
+"""
+Builds the PDF report from the .tex file with pdflatex. The build is skipped
+when the .tex and the images it includes are unchanged since the last build,
+and a further pass only runs while the auxiliary files (.aux, .toc, .out) still
+change. Errors are reported from the pdflatex log.
+
+Usage: python3 src/build_pdf.py [--tex output/Raport_Wplywu_2022-2025.tex] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from metrics import recorder
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEX_PATH = "output/Raport_Wplywu_2022-2025.tex"
+AUX_EXTENSIONS = [".aux", ".toc", ".out"]
+MAX_PASSES = 4
+STATE_SUFFIX = ".build.json"
+
+INCLUDE_PATTERN = re.compile(r'\\includegraphics(?:\[[^\]]*\])?\{([^}]+)\}')
+# pdflatex errors: "! message" (and "file:line: message" with -file-line-error)
+ERROR_PATTERN = re.compile(r'^(?:!|[^\s:]+\.tex:\d+:) ')
+RERUN_PATTERN = re.compile(r'Rerun to get|Label\(s\) may have changed')
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def build_inputs(tex_path):
+    """Hashes of the .tex file and of the images it includes (paths relative to BASE_DIR)."""
+    with open(os.path.join(BASE_DIR, tex_path), "r", encoding="utf-8") as f:
+        images = INCLUDE_PATTERN.findall(f.read())
+    return {path: file_hash(os.path.join(BASE_DIR, path)) for path in [tex_path] + sorted(set(images))}
+
+def aux_hashes(base_path):
+    return {ext: file_hash(base_path + ext) for ext in AUX_EXTENSIONS}
+
+def log_errors(log_path, context=2):
+    """Error messages of a pdflatex log, each with the lines following it (the source line)."""
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path, "r", encoding="latin-1") as f:
+        lines = f.read().splitlines()
+    return ["\n".join(lines[i:i + 1 + context]) for i, line in enumerate(lines) if ERROR_PATTERN.match(line)]
+
+def needs_rerun(log_path):
+    """Whether LaTeX itself asked for another pass."""
+    if not os.path.exists(log_path):
+        return False
+    with open(log_path, "r", encoding="latin-1") as f:
+        return bool(RERUN_PATTERN.search(f.read()))
+
+def run_pdflatex(tex_path, output_dir):
+    command = ["pdflatex", "-interaction=nonstopmode", "-file-line-error",
+               "-output-directory", output_dir, tex_path]
+    return subprocess.run(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+def build_pdf(tex_path=TEX_PATH, force=False, max_passes=MAX_PASSES):
+    """
+    Compile tex_path (relative to BASE_DIR) into a PDF next to it, unless it is up
+    to date. Returns the list of LaTeX errors (empty on success).
+    """
+    output_dir = os.path.dirname(tex_path) or "."
+    base_path = os.path.join(BASE_DIR, os.path.splitext(tex_path)[0])
+    pdf_path, log_path, state_path = base_path + ".pdf", base_path + ".log", base_path + STATE_SUFFIX
+
+    inputs = build_inputs(tex_path)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    if not force and state.get("inputs") == inputs and state.get("pdf") == file_hash(pdf_path):
+        print(f"{os.path.relpath(pdf_path, BASE_DIR)} is up to date.")
+        return []
+
+    start = time.monotonic()
+    for passes in range(1, max_passes + 1):
+        before = aux_hashes(base_path)
+        returncode = run_pdflatex(tex_path, output_dir)
+        errors = log_errors(log_path)
+        if returncode != 0 or errors:
+            if not errors:
+                errors = [f"pdflatex exited with status {returncode}, see {os.path.relpath(log_path, BASE_DIR)}"]
+            print(f"LaTeX errors in {tex_path}:")
+            for error in errors:
+                print(error)
+            # No state is saved, so the next run compiles again
+            return errors
+        if aux_hashes(base_path) == before and not needs_rerun(log_path):
+            break
+    else:
+        print(f"Warning: auxiliary files still changing after {max_passes} passes")
+
+    with open(state_path, "w") as f:
+        json.dump({"inputs": inputs, "pdf": file_hash(pdf_path)}, f, indent=4)
+    print(f"{os.path.relpath(pdf_path, BASE_DIR)} built in {passes} pass(es), {time.monotonic() - start:.1f}s")
+    return []
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the PDF report from its .tex file.")
+    parser.add_argument("--tex", default=TEX_PATH, help=f"LaTeX file, relative to the repository (default: {TEX_PATH})")
+    parser.add_argument("--force", action="store_true", help="Compile even if the inputs did not change")
+    args = parser.parse_args()
+
+    try:
+        with recorder.stage("pdf"):
+            errors = build_pdf(args.tex, force=args.force)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Metrics saved to {recorder.save('pdf')}")
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,210 @@
+"""
+Submission-level diff of two ClinVar result snapshots (clinvar_results.csv).
+
+A submission is identified by its gene and SCV accession; its rows (one per
+phenotype) are merged into one record. Both files are streamed and split into
+hash partitions of the SCV accession spooled to temporary files, so only one
+partition of each snapshot is held in memory at a time (snapshots smaller than
+PARTITION_BYTES are compared directly).
+"""
+import csv
+import json
+import math
+import os
+import pickle
+import tempfile
+import zlib
+from datetime import datetime
+from operator import itemgetter
+
+PARTITION_BYTES = 16 * 1024 * 1024  # Snapshot bytes per partition held in memory
+SPOOL_ROWS = 20000  # Rows buffered across all partition spools before they are written
+
+# Per-submission fields compared between the snapshots, with the kind of change they make.
+# Phenotypes of the submission's rows are compared as a set.
+COMPARED_FIELDS = [
+    ("Classification", "reclassified"),
+    ("Date Created", "date_changed"),
+    ("Submission Version", "metadata_changed"),
+    ("Review Status", "metadata_changed"),
+    ("Phenotype", "metadata_changed"),
+    ("Submitter", "metadata_changed"),
+    ("Variant (HGVS)", "metadata_changed"),
+    ("Consequence", "metadata_changed"),
+    ("VCV Accession", "metadata_changed"),
+]
+CHANGE_KINDS = ["added", "removed", "reclassified", "date_changed", "metadata_changed"]
+CHANGELOG_FIELDS = ["Change", "Gene", "VCV Accession", "Submission Accession", "Field", "Old", "New"]
+# Columns kept of each row: the submission key, then the compared fields
+ROW_FIELDS = ["Gene", "Submission Accession"] + [field for field, _ in COMPARED_FIELDS]
+PHENOTYPE = ROW_FIELDS.index("Phenotype")
+VCV = ROW_FIELDS.index("VCV Accession")
+SUBMITTER = ROW_FIELDS.index("Submitter")
+
+def read_rows(f):
+    """Rows of a results CSV as lists of ROW_FIELDS (columns missing from the file are empty)."""
+    reader = csv.reader(f)
+    header = next(reader, [])
+    # Missing columns point past the end of the row, where an empty value is appended
+    get = itemgetter(*[header.index(field) if field in header else len(header) for field in ROW_FIELDS])
+    for row in reader:
+        row.append("")
+        values = list(get(row))
+        if not values[1] or values[1] == "N/A":
+            # Rows without an SCV are told apart by their variant and submitter
+            values[1] = f"{values[VCV]}|{values[SUBMITTER]}"
+        yield values
+
+def partition_count(*paths):
+    return max(1, math.ceil(sum(os.path.getsize(path) for path in paths) / PARTITION_BYTES))
+
+def spool_partitions(path, partitions):
+    """
+    Split the rows of a results CSV into `partitions` temporary files by SCV hash,
+    as pickled batches of ROW_FIELDS lists (read back by read_spool). At most
+    SPOOL_ROWS rows are buffered in total, however many partitions there are.
+    """
+    spools = [tempfile.TemporaryFile() for _ in range(partitions)]
+    batches = [[] for _ in range(partitions)]
+
+    def flush():
+        for spool, batch in zip(spools, batches):
+            if batch:
+                pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+                batch.clear()
+
+    buffered = 0
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for values in read_rows(f):
+            batches[zlib.crc32(values[1].encode("utf-8")) % partitions].append(values)
+            buffered += 1
+            if buffered >= SPOOL_ROWS:
+                flush()
+                buffered = 0
+    flush()
+    for spool in spools:
+        spool.seek(0)
+    return spools
+
+def read_spool(spool):
+    while True:
+        try:
+            yield from pickle.load(spool)
+        except EOFError:
+            return
+
+def iter_partitions(old_file, new_file, partitions):
+    """(old rows, new rows) of each partition of the two snapshots."""
+    if partitions == 1:
+        with open(old_file, "r", newline="", encoding="utf-8") as old, \
+                open(new_file, "r", newline="", encoding="utf-8") as new:
+            yield read_rows(old), read_rows(new)
+        return
+    old_spools = spool_partitions(old_file, partitions)
+    new_spools = spool_partitions(new_file, partitions)
+    try:
+        for old, new in zip(old_spools, new_spools):
+            yield read_spool(old), read_spool(new)
+    finally:
+        for spool in old_spools + new_spools:
+            spool.close()
+
+def load_submissions(rows):
+    """
+    Submissions of rows (ROW_FIELDS lists) keyed by (gene, SCV); the phenotypes of
+    a submission's rows are merged into one sorted "; "-separated value.
+    """
+    submissions = {}
+    phenotypes = {}  # Of the submissions with several rows
+    for values in rows:
+        key = (values[0], values[1])
+        record = submissions.get(key)
+        if record is None:
+            submissions[key] = values
+        else:
+            phenotypes.setdefault(key, {record[PHENOTYPE]}).add(values[PHENOTYPE])
+    for key, values in phenotypes.items():
+        submissions[key][PHENOTYPE] = "; ".join(sorted(values))
+    return submissions
+
+def compare_submissions(old, new):
+    """Change records (dicts with CHANGELOG_FIELDS) between the submissions of one partition."""
+    changes = []
+    for key in old.keys() - new.keys():
+        before = old[key]
+        changes.append({"Change": "removed", "Gene": key[0], "VCV Accession": before[VCV],
+                        "Submission Accession": key[1], "Field": "Classification", "Old": before[2], "New": ""})
+    for key, after in new.items():
+        gene, scv = key
+        before = old.get(key)
+        if before is None:
+            changes.append({"Change": "added", "Gene": gene, "VCV Accession": after[VCV],
+                            "Submission Accession": scv, "Field": "Classification", "Old": "", "New": after[2]})
+            continue
+        if before == after:
+            continue
+        for i, (field, kind) in enumerate(COMPARED_FIELDS, start=2):
+            old_value, new_value = before[i], after[i]
+            if old_value == new_value:
+                continue
+            if field == "Classification" and old_value.casefold() == new_value.casefold():
+                # ClinVar is not consistent about the case ("Likely pathogenic" / "Likely Pathogenic")
+                continue
+            if field == "Submission Version" and not (old_value and new_value):
+                # Snapshots fetched before the version was recorded
+                continue
+            changes.append({"Change": kind, "Gene": gene, "VCV Accession": after[VCV],
+                            "Submission Accession": scv, "Field": field, "Old": old_value, "New": new_value})
+    changes.sort(key=itemgetter("Gene", "Submission Accession"))
+    return changes
+
+def diff_snapshots(old_file, new_file, changelog_base=None, partitions=None, sample=20):
+    """
+    Compare two results CSVs at submission level. Writes the change records to
+    changelog_base + ".csv" and a summary to changelog_base + ".json" (when given).
+    Returns (summary dict, the first `sample` changes of each kind).
+    """
+    if partitions is None:
+        partitions = partition_count(old_file, new_file)
+    summary = {
+        "old": old_file, "new": new_file, "generated": datetime.now().isoformat(timespec="seconds"),
+        "partitions": partitions, "submissions": {"old": 0, "new": 0},
+        "changes": dict.fromkeys(CHANGE_KINDS, 0), "by_gene": {},
+    }
+    samples = {kind: [] for kind in CHANGE_KINDS}
+
+    changelog = tmp_path = None
+    try:
+        if changelog_base is not None:
+            os.makedirs(os.path.dirname(changelog_base) or ".", exist_ok=True)
+            tmp_path = changelog_base + ".csv.tmp"
+            changelog = open(tmp_path, "w", newline="", encoding="utf-8")
+            writer = csv.DictWriter(changelog, fieldnames=CHANGELOG_FIELDS)
+            writer.writeheader()
+        for old_rows, new_rows in iter_partitions(old_file, new_file, partitions):
+            old = load_submissions(old_rows)
+            new = load_submissions(new_rows)
+            summary["submissions"]["old"] += len(old)
+            summary["submissions"]["new"] += len(new)
+            for change in compare_submissions(old, new):
+                kind = change["Change"]
+                summary["changes"][kind] += 1
+                gene_counts = summary["by_gene"].setdefault(change["Gene"], dict.fromkeys(CHANGE_KINDS, 0))
+                gene_counts[kind] += 1
+                if len(samples[kind]) < sample:
+                    samples[kind].append(change)
+                if changelog is not None:
+                    writer.writerow(change)
+    finally:
+        if changelog is not None:
+            changelog.close()
+
+    if changelog_base is not None:
+        os.replace(tmp_path, changelog_base + ".csv")
+        summary["changelog"] = changelog_base + ".csv"
+        summary["by_gene"] = dict(sorted(summary["by_gene"].items()))
+        tmp_path = changelog_base + ".json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, changelog_base + ".json")
+    return summary, samples
@@ -0,0 +1,287 @@
+"""
+Library API of the report pipeline. Each stage takes and returns in-memory
+DataFrames with explicit paths and config, so the stages can be chained in one
+process (see run) or embedded in other tools:
+
+    import clinvar_report as report
+    results = report.fetch()
+    kept, rejected = report.filter(results, "config/filtering.json")
+    report.render_charts(kept, "cache/")
+    report.render_latex(kept, rejected, "config/", "cache/", "output/Raport_Wplywu_2022-2025.tex")
+
+run_panels builds the reports of several gene panels (config/panels.json) in one run.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import fetch_clinvar_data
+import filter_clinvar_data
+import generate_impact_report
+import generate_latex_report
+from build_pdf import build_pdf
+from clinvar_tables import flat_view, load_tables, read_results, write_results
+from dataset_io import frame_from_rows, write_dataset
+from fetch_bibliography import get_bibliography
+from metrics import MetricsRecorder, recorder
+from response_cache import ResponseCache
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PANELS_CONFIG = os.path.join("config", "panels.json")
+
+def fetch(genes=None, workers=1, use_history=True, release=None, api_key=None,
+          cache_dir=fetch_clinvar_data.RESPONSE_CACHE_DIR, offline=False):
+    """
+    Fetch the P/LP variants of the genes (default: fetch_clinvar_data.GENES) from
+    E-utilities, or from a local VCV release file when `release` is given.
+    Responses are cached in cache_dir (None disables the cache) with the lifetime
+    and size limit of fetch_clinvar_data.main, and expired entries are evicted after
+    an online fetch. Returns a DataFrame with the columns of clinvar_results.csv.
+    """
+    genes = genes or fetch_clinvar_data.GENES
+    if release:
+        from ingest_clinvar_release import ingest_release
+        rows = ingest_release(release, genes, workers=workers)
+    else:
+        cache = None
+        if cache_dir:
+            cache = ResponseCache(cache_dir, ttl=fetch_clinvar_data.CACHE_TTL_HOURS * 3600,
+                                  max_size=int(fetch_clinvar_data.CACHE_MAX_SIZE_MB * 1024 * 1024),
+                                  offline=offline)
+        fetch_clinvar_data.configure(api_key or fetch_clinvar_data.API_KEY, cache)
+        failed = set()
+        rows = list(fetch_clinvar_data.fetch_all(genes, workers=workers, use_history=use_history, failed=failed))
+        if failed:
+            print(f"Genes with errors: {', '.join(sorted(failed))}")
+        if cache is not None and not offline:
+            cache.evict()
+    return frame_from_rows(rows, fetch_clinvar_data.FIELDNAMES)
+
+def filter(df, config, matcher_cache=None):
+    """
+    Apply the report filters to a fetched DataFrame. `config` is a filtering.json
+    path or a dict as returned by filter_clinvar_data.load_config.
+    Returns (kept, rejected) DataFrames.
+    """
+    if isinstance(config, str):
+        config = filter_clinvar_data.load_config(config)
+    return filter_clinvar_data.filter_variants(df, config, matcher_cache)
+
+def render_charts(df, output_dir, years=generate_impact_report.REPORT_YEARS, workers=None, force=False):
+    """
+    Draw the report charts of the kept variants into output_dir (only those whose
+    data changed, unless force); returns the image paths.
+    """
+    return generate_impact_report.render_charts(df, output_dir, years, workers=workers, force=force)
+
+def render_latex(kept, rejected, config_dir, cache_dir, output_path, texts=None, chart_dir="cache"):
+    """Write the LaTeX report of the kept and rejected variants; returns output_path."""
+    return generate_latex_report.render_latex(kept, rejected, config_dir, cache_dir, output_path,
+                                              texts=texts, chart_dir=chart_dir)
+
+def run(base_dir=BASE_DIR, fetch_data=True, save=True, workers=1, release=None, offline=False):
+    """
+    Run fetch, filter, charts and LaTeX in this process, passing DataFrames between
+    the stages. With fetch_data=False the results of the last fetch are loaded from
+    the cache. With save=True the datasets are also written to the cache for the
+    standalone scripts. Returns the path of the .tex file.
+    """
+    config_dir = os.path.join(base_dir, "config")
+    cache_dir = os.path.join(base_dir, "cache")
+    output_dir = os.path.join(base_dir, "output")
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.monotonic()
+    with recorder.stage("fetch" if fetch_data else "load") as stage:
+        if fetch_data:
+            results = fetch(workers=workers, release=release, offline=offline,
+                            cache_dir=os.path.join(base_dir, fetch_clinvar_data.RESPONSE_CACHE_DIR))
+            if save:
+                write_results(results, os.path.join(cache_dir, "clinvar_results"))
+        else:
+            results = read_results(os.path.join(cache_dir, "clinvar_results"))
+        stage["rows_out"] = len(results)
+    print(f"{len(results)} result rows ready in {time.monotonic() - start:.1f}s")
+
+    with recorder.stage("filter", rows_in=len(results)) as stage:
+        kept, rejected = filter(results, os.path.join(config_dir, "filtering.json"),
+                                os.path.join(cache_dir, "keyword_matcher.pkl"))
+        if save:
+            write_dataset(kept, os.path.join(cache_dir, "clinvar_filtered_2022_2025_final"))
+            write_dataset(rejected, os.path.join(cache_dir, "rejected_variants"))
+        stage["rows_out"] = len(kept)
+        stage["rows_rejected"] = len(rejected)
+    filter_clinvar_data.print_summary(kept, rejected)
+
+    with recorder.stage("charts", rows_in=len(kept)):
+        render_charts(kept, cache_dir)
+    with recorder.stage("latex", rows_in=len(kept) + len(rejected)):
+        tex_path = render_latex(kept, rejected, config_dir, cache_dir,
+                                os.path.join(output_dir, generate_latex_report.REPORT_FILENAME))
+    print(f"Report rendered in {time.monotonic() - start:.1f}s")
+    print(f"Metrics saved to {recorder.save('report')}")
+    return tex_path
+
+def load_panels(path):
+    """
+    Panels of a panels.json file. Each panel has a name, its genes, first_year and
+    last_year of the submissions counted, and optionally texts (overriding entries of
+    report_text.json) and filtering (overriding entries of filtering.json).
+    """
+    with open(path, "r") as f:
+        panels = json.load(f)["panels"]
+    names = [panel["name"] for panel in panels]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate panel names in {path}")
+    return panels
+
+def build_panel(panel, results, base_dir=BASE_DIR, pdf=False):
+    """
+    Filter the results of the panel's genes and render its charts and LaTeX report
+    (and PDF) into cache/panels/<name>/ and output/panels/<name>.tex. Runs in a worker
+    process of run_panels. Returns (tex path, kept rows, rejected rows, LaTeX errors).
+    """
+    name = panel["name"]
+    config_dir = os.path.join(base_dir, "config")
+    cache_dir = os.path.join(base_dir, "cache")
+    panel_dir = os.path.join(cache_dir, "panels", name)
+    output_dir = os.path.join(base_dir, "output", "panels")
+    os.makedirs(panel_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    years = list(range(panel["first_year"], panel["last_year"] + 1))
+    # Stages are recorded per panel, not in the recorder inherited from the parent process
+    metrics = MetricsRecorder()
+
+    config = filter_clinvar_data.load_config(os.path.join(config_dir, "filtering.json"))
+    config.update(panel.get("filtering", {}))
+    config["years"] = years
+    with metrics.stage("filter", rows_in=len(results)) as stage:
+        kept, rejected = filter(results, config, os.path.join(panel_dir, "keyword_matcher.pkl"))
+        write_dataset(kept, os.path.join(panel_dir, "clinvar_filtered"))
+        write_dataset(rejected, os.path.join(panel_dir, "rejected_variants"))
+        stage["rows_out"] = len(kept)
+
+    with metrics.stage("charts", rows_in=len(kept)):
+        # Panels are already built in parallel processes
+        render_charts(kept, panel_dir, years, workers=1)
+    tex_path = os.path.join(output_dir, f"{name}.tex")
+    with metrics.stage("latex", rows_in=len(kept) + len(rejected)):
+        render_latex(kept, rejected, config_dir, cache_dir, tex_path, texts=panel.get("texts"),
+                     chart_dir=os.path.relpath(panel_dir, base_dir).replace(os.sep, "/"))
+    errors = []
+    if pdf:
+        with metrics.stage("pdf"):
+            errors = build_pdf(os.path.relpath(tex_path, base_dir))
+    metrics.save(f"panel-{name}")
+    return tex_path, len(kept), len(rejected), errors
+
+def run_panels(panels_path=PANELS_CONFIG, base_dir=BASE_DIR, fetch_data=True, panel_names=None, workers=None,
+               fetch_workers=1, release=None, offline=False, pdf=False):
+    """
+    Build the reports of several gene panels. The union of their genes is fetched
+    once (or loaded from cache/panels/ with fetch_data=False); each panel is then
+    filtered and rendered in its own worker process (at most `workers`).
+    Returns {panel name: .tex path} of the panels built without errors and the
+    names of the panels that failed.
+    """
+    panels = load_panels(os.path.join(base_dir, panels_path))
+    if panel_names:
+        unknown = set(panel_names) - {panel["name"] for panel in panels}
+        if unknown:
+            raise ValueError(f"Unknown panels: {', '.join(sorted(unknown))}")
+        panels = [panel for panel in panels if panel["name"] in panel_names]
+    genes = list(dict.fromkeys(gene for panel in panels for gene in panel["genes"]))
+    cache_dir = os.path.join(base_dir, "cache")
+    results_path = os.path.join(cache_dir, "panels", "clinvar_results")
+
+    start = time.monotonic()
+    with recorder.stage("fetch" if fetch_data else "load") as stage:
+        if fetch_data:
+            results = fetch(genes, workers=fetch_workers, release=release, offline=offline,
+                            cache_dir=os.path.join(base_dir, fetch_clinvar_data.RESPONSE_CACHE_DIR))
+            tables = write_results(results, results_path)
+        else:
+            tables = load_tables(results_path)
+        stage["rows_out"] = len(tables["submissions"])
+    missing = set(genes) - set(tables["gene_variants"]['Gene'].dropna().astype(str))
+    if missing:
+        print(f"No results for genes: {', '.join(sorted(missing))}")
+    print(f"{len(tables['submissions'])} submissions of {len(tables['variants'])} variants "
+          f"({len(genes)} genes) ready in {time.monotonic() - start:.1f}s")
+
+    # Fetched once here, so that the panel processes only read the cache
+    with recorder.stage("bibliography"):
+        get_bibliography(os.path.join(base_dir, "config", "config_dois.json"),
+                         os.path.join(cache_dir, "bibliography_cache.json"))
+
+    built, failed = {}, []
+    with recorder.stage("panels", rows_in=len(tables["submissions"])), \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for panel in panels:
+            # Flat rows of the panel's genes only
+            subset = flat_view(tables, genes=panel["genes"])
+            futures[pool.submit(build_panel, panel, subset, base_dir, pdf)] = panel["name"]
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                tex_path, kept, rejected, errors = future.result()
+            except Exception as e:
+                print(f"[{name}] FAILED: {e}")
+                failed.append(name)
+                continue
+            if errors:
+                print(f"[{name}] LaTeX errors in {tex_path}")
+                failed.append(name)
+                continue
+            built[name] = tex_path
+            print(f"[{name}] Kept: {kept}, Rejected: {rejected} -> {tex_path}")
+
+    print(f"Built {len(built)} of {len(panels)} panels in {time.monotonic() - start:.1f}s"
+          + (f", failed: {', '.join(sorted(failed))}" if failed else ""))
+    print(f"Metrics saved to {recorder.save('panels')}")
+    return built, sorted(failed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the report pipeline in a single process.")
+    parser.add_argument("--no-fetch", action="store_true",
+                        help="Use the results of the last fetch from cache/ instead of fetching")
+    parser.add_argument("--no-save", action="store_true",
+                        help="Do not write the intermediate datasets to cache/")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent requests / parser processes (default: 1)")
+    parser.add_argument("--release", metavar="FILE",
+                        help="Read variants from a local ClinVar VCV release instead of E-utilities")
+    parser.add_argument("--offline", action="store_true",
+                        help="Rebuild the results purely from the response cache")
+    parser.add_argument("--panels", nargs="?", const=PANELS_CONFIG, metavar="FILE",
+                        help=f"Build the reports of the gene panels in FILE (default: {PANELS_CONFIG}) "
+                             "into output/panels/")
+    parser.add_argument("--panel", nargs="+", metavar="NAME", help="With --panels, build only these panels")
+    parser.add_argument("--panel-workers", type=int,
+                        help="With --panels, number of panels built in parallel (default: CPU count)")
+    parser.add_argument("--pdf", action="store_true", help="With --panels, also build the PDF reports")
+    parser.add_argument("--profile", metavar="STAGE",
+                        help="Write a cProfile dump of this stage (fetch, load, filter, charts, latex, "
+                             "bibliography) to cache/metrics/")
+    args = parser.parse_args()
+    if args.profile:
+        recorder.profile_stage = args.profile
+
+    if args.panels:
+        built, failed = run_panels(args.panels, fetch_data=not args.no_fetch, panel_names=args.panel,
+                           workers=args.panel_workers, fetch_workers=args.workers, release=args.release,
+                           offline=args.offline,
+                           pdf=args.pdf)
+        # A run in which any panel failed must not pass for a successful one
+        sys.exit(1 if failed or not built else 0)
+    run(fetch_data=not args.no_fetch, save=not args.no_save, workers=args.workers,
+        release=args.release, offline=args.offline)
+
+if __name__ == "__main__":
+    main()
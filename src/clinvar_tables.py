@@ -0,0 +1,218 @@
+"""
+Normalized storage of the fetched ClinVar results.
+
+The fetch emits one flat row per submission phenotype, repeating the variant and
+submission fields on every row and every variant under each gene it overlaps.
+The results are stored instead as four tables in a directory next to the flat
+CSV export (cache/clinvar_results/ beside cache/clinvar_results.csv):
+
+- variants: one row per VCV accession (or per differing copy of it, see
+  variant_copies), with the number of its submissions,
+- submissions: one row per submission of a variant, grouped by variant in the
+  order of the variants table, with the number of its phenotypes,
+- submission_phenotypes: the phenotypes, grouped by submission in the same way,
+- gene_variants: the genes each variant was fetched for, in fetch order.
+
+Children are linked to their parent by position and count rather than by
+repeating the accessions, and gene_variants stores the step from the variant of
+the previous row (almost always 1, which Parquet encodes in a few bytes).
+flat_view rebuilds the flat rows the later stages work with, only for the genes
+and columns asked for.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import PARQUET_AVAILABLE, SCHEMA, apply_schema, read_csv, read_dataset, write_dataset
+
+# Columns of the flat rows stored in each table
+TABLES = {
+    "variants": ["VCV Accession", "Variation ID", "Variant (HGVS)", "Consequence"],
+    "submissions": ["Submission Accession", "Submission Version", "Classification", "Date Created",
+                    "Submitter", "Review Status"],
+    "submission_phenotypes": ["Phenotype"],
+    "gene_variants": ["Gene"],
+}
+
+# Values of the submission accession of a submission without a ClinVarAccession
+MISSING_ACCESSIONS = ["", "N/A"]
+
+def group_codes(*keys):
+    """Code of the combination of the keys of each row, numbered in order of first appearance."""
+    code = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        key = pd.factorize(key, use_na_sentinel=False)[0]
+        code = pd.factorize(code * (key.max() + 1 if len(key) else 1) + key)[0]
+    return code
+
+def submission_codes(df, variant):
+    """
+    Code of the submission of each row (rows grouped by variant), by variant and
+    SCV accession. A submission without an accession (see MISSING_ACCESSIONS) is
+    told apart by its run of consecutive rows with the same submission fields.
+    """
+    accession = df['Submission Accession']
+    key = pd.factorize(accession, use_na_sentinel=False)[0]
+    missing = np.flatnonzero((accession.isna() | accession.isin(MISSING_ACCESSIONS)).to_numpy())
+    if len(missing):
+        fields = pd.util.hash_pandas_object(df[TABLES["submissions"]].iloc[missing], index=False).to_numpy()
+        changed = ((np.diff(fields, prepend=fields[:1] + 1) != 0) | (np.diff(missing, prepend=-2) != 1)
+                   | (np.diff(variant[missing], prepend=-1) != 0))
+        # Runs are numbered after the accessions, so they never share a key with one
+        key[missing] = key.max() + 1 + np.cumsum(changed)
+    return group_codes(variant, key)
+
+def variant_copies(df):
+    """
+    Index of the stored variant of each row. The rows of a variant fetched for
+    several genes are stored once when every gene has the same rows for it; a gene
+    whose rows differ (e.g. after an incremental refresh of only that gene) gets a
+    copy of its own.
+    """
+    columns = [column for columns in TABLES.values() for column in columns if column != "Gene"]
+    vcv = pd.factorize(df['VCV Accession'], use_na_sentinel=False)[0]
+    group = group_codes(df['Gene'], vcv)
+    # Only the rows of variants fetched for several genes have copies to compare
+    group_vcv = np.zeros(group.max(initial=-1) + 1, dtype=np.int64)
+    group_vcv[group] = vcv
+    shared = np.flatnonzero(np.bincount(group_vcv, minlength=vcv.max(initial=-1) + 1)[vcv] > 1)
+    signature = np.zeros(len(group_vcv), dtype=np.uint64)
+    if len(shared):
+        row_hash = pd.util.hash_pandas_object(df[columns].iloc[shared], index=False).to_numpy()
+        position = pd.Series(group[shared]).groupby(group[shared]).cumcount().to_numpy()
+        # Order-sensitive 64-bit signature of the rows of each (gene, variant) group
+        salted = pd.util.hash_array(row_hash ^ position.astype(np.uint64))
+        sums = pd.Series(salted).groupby(group[shared]).sum()
+        signature[sums.index.to_numpy()] = sums.to_numpy()
+    size = np.bincount(group)
+    return group_codes(vcv, signature[group], size[group]).astype(np.int32)
+
+def normalize(df):
+    """Split flat result rows into the TABLES (dict of DataFrames)."""
+    df = df.reset_index(drop=True)
+    # Columns missing from older exports (e.g. Submission Version) stay empty
+    for columns in TABLES.values():
+        for column in columns:
+            if column not in df.columns:
+                df[column] = None
+    variant = variant_copies(df)
+    gene_variants = pd.DataFrame({'Gene': df['Gene'], 'Variant': variant}).drop_duplicates()
+    gene_variants['Variant'] = np.diff(gene_variants['Variant'].to_numpy(), prepend=0).astype(np.int32)
+
+    # A variant copy shared by several genes is stored once, from the first gene
+    first_gene = df['Gene'].groupby(variant).transform('first')
+    rows = df[(df['Gene'] == first_gene).to_numpy()]
+    rows = rows.iloc[np.argsort(variant[rows.index], kind="stable")]
+    submission = submission_codes(rows, variant[rows.index])
+    rows = rows.iloc[np.argsort(submission, kind="stable")]
+    submission = np.sort(submission)
+
+    first_rows = ~pd.Series(submission).duplicated().to_numpy()
+    submissions = rows.loc[first_rows, TABLES["submissions"]].reset_index(drop=True)
+    submissions['Phenotypes'] = np.bincount(submission).astype(np.int32)
+    submission_variant = variant[rows.index[first_rows]]
+    variants = df.loc[~pd.Series(variant).duplicated().to_numpy(), TABLES["variants"]].reset_index(drop=True)
+    variants['Submissions'] = np.bincount(submission_variant, minlength=len(variants)).astype(np.int32)
+    return {
+        "variants": variants,
+        "submissions": submissions,
+        "submission_phenotypes": rows[TABLES["submission_phenotypes"]].reset_index(drop=True),
+        "gene_variants": gene_variants.reset_index(drop=True),
+    }
+
+def expand(counts, parents):
+    """
+    Rows of the children of `parents` (positions in a parent table whose children
+    number `counts`, stored consecutively), and the index in `parents` of each.
+    """
+    starts = np.concatenate([[0], np.cumsum(counts)])[parents]
+    sizes = counts[parents]
+    owner = np.repeat(np.arange(len(parents)), sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return starts[owner] + offsets, owner
+
+def flat_view(tables, genes=None, columns=None):
+    """
+    Flat result rows (one per gene, submission and phenotype, in fetch order) of
+    the tables, restricted to `genes` and `columns` when given. Only the requested
+    columns are materialized.
+    """
+    gene_variants = tables["gene_variants"]
+    variant = np.cumsum(gene_variants['Variant'].to_numpy(dtype=np.int64))
+    if genes is not None:
+        selected = gene_variants['Gene'].isin(genes).to_numpy()
+        gene_variants, variant = gene_variants[selected], variant[selected]
+    submission, link = expand(tables["variants"]['Submissions'].to_numpy(dtype=np.int64), variant)
+    phenotype, owner = expand(tables["submissions"]['Phenotypes'].to_numpy(dtype=np.int64), submission)
+    link = link[owner]
+    positions = {
+        "gene_variants": link,
+        "variants": variant[link],
+        "submissions": submission[owner],
+        "submission_phenotypes": phenotype,
+    }
+    # In the column order of the flat export (which SCHEMA follows)
+    data = {}
+    for column in SCHEMA:
+        if columns is not None and column not in columns:
+            continue
+        for name, table_columns in TABLES.items():
+            if column in table_columns:
+                table = gene_variants if name == "gene_variants" else tables[name]
+                data[column] = table[column].take(positions[name]).reset_index(drop=True)
+    return apply_schema(pd.DataFrame(data, index=pd.RangeIndex(len(phenotype))))
+
+def table_paths(base_path):
+    return {name: os.path.join(base_path, name) for name in TABLES}
+
+def write_results(df, base_path, csv=True):
+    """
+    Store flat result rows as the normalized tables in the base_path directory and,
+    unless csv=False, as the flat base_path + ".csv" export. Returns the tables.
+    """
+    os.makedirs(base_path, exist_ok=True)
+    # The export goes first, so the tables are never older than it
+    if csv:
+        tmp_path = base_path + ".csv.tmp"
+        apply_schema(df.copy()).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, base_path + ".csv")
+    tables = normalize(df)
+    for name, path in table_paths(base_path).items():
+        # Without pyarrow the tables themselves are CSV files
+        tables[name] = write_dataset(tables[name], path, csv=not PARQUET_AVAILABLE)
+    # Flat Parquet copy written before the tables existed
+    if os.path.exists(base_path + ".parquet"):
+        os.remove(base_path + ".parquet")
+    return tables
+
+def convert_results(base_path):
+    """Write the tables of a flat CSV export produced outside of write_results."""
+    return write_results(read_csv(base_path + ".csv"), base_path, csv=False)
+
+def tables_current(base_path):
+    """Whether the tables exist and are not older than the flat CSV export."""
+    extension = ".parquet" if PARQUET_AVAILABLE else ".csv"
+    paths = [path + extension for path in table_paths(base_path).values()]
+    if not all(os.path.exists(path) for path in paths):
+        return False
+    csv_path = base_path + ".csv"
+    return not os.path.exists(csv_path) or min(map(os.path.getmtime, paths)) >= os.path.getmtime(csv_path)
+
+def read_tables(base_path):
+    """The normalized tables stored in the base_path directory."""
+    return {name: read_dataset(path) for name, path in table_paths(base_path).items()}
+
+def load_tables(base_path):
+    """
+    Tables of a dataset written by write_results (base_path has no extension): the
+    stored tables when they are up to date with the CSV export, otherwise the
+    normalized rows of the CSV.
+    """
+    if tables_current(base_path):
+        return read_tables(base_path)
+    return normalize(read_csv(base_path + ".csv"))
+
+def read_results(base_path, genes=None, columns=None):
+    """Flat result rows of a dataset written by write_results, restricted to `genes` and `columns` when given."""
+    return flat_view(load_tables(base_path), genes, columns)
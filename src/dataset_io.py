@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Declared types of every column exchanged between the pipeline stages.
+# "category" columns hold few distinct values; "datetime" columns are parsed once
+# when a CSV is read and stored natively in Parquet.
+SCHEMA = {
+    "Gene": "category",
+    "Phenotype": "string",
+    "Classification": "category",
+    "Variant (HGVS)": "string",
+    "Date Created": "datetime",
+    "Submitter": "category",
+    "Consequence": "category",
+    "Review Status": "category",
+    "Variation ID": "Int64",
+    "VCV Accession": "string",
+    "Submission Accession": "string",
+    "Submission Version": "Int64",
+    # Added by filter_clinvar_data.py
+    "Estimated Size": "Int64",
+    "Assembly": "category",
+    "Chromosome": "category",
+    "Start": "Int64",
+    "End": "Int64",
+    "Min Size": "Int64",
+    "Max Size": "Int64",
+    "Recurrent Region": "category",
+    "Rejection Reason": "string",
+}
+
+def apply_schema(df):
+    """Cast the columns of df listed in SCHEMA to their declared types (in place)."""
+    for column, kind in SCHEMA.items():
+        if column not in df.columns:
+            continue
+        if kind == "datetime":
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+        elif kind == "category":
+            values = df[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("string").astype("category")
+            # Categories of rows dropped by an earlier filter are not stored
+            df[column] = values.cat.remove_unused_categories()
+        elif kind == "Int64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+        else:
+            df[column] = df[column].astype("string")
+    return df
+
+def frame_from_rows(rows, columns):
+    """
+    DataFrame with the declared schema from rows as written to the CSV (tuples in
+    column order or dicts), with empty fields as missing values (as read_csv would
+    load them).
+    """
+    df = pd.DataFrame.from_records(list(rows), columns=columns)
+    return apply_schema(df.mask(df == ""))
+
+def read_csv(path, columns=None):
+    """
+    Read a pipeline CSV with the declared schema. Only empty fields are missing
+    values, so literal strings such as "N/A" are kept as they are.
+    """
+    df = pd.read_csv(path, usecols=columns, dtype=str, keep_default_na=False, na_values=[""])
+    return apply_schema(df)
+
+def read_dataset(base_path, columns=None):
+    """
+    Load a dataset stored as base_path + ".parquet" and/or ".csv" (base_path has no
+    extension). The Parquet file is used when it is available and not older than the
+    CSV export; otherwise the CSV is parsed. `columns` restricts the columns loaded.
+    """
+    parquet_path = base_path + ".parquet"
+    csv_path = base_path + ".csv"
+    if PARQUET_AVAILABLE and os.path.exists(parquet_path) and (
+            not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return apply_schema(pd.read_parquet(parquet_path, columns=columns))
+    return read_csv(csv_path, columns)
+
+def write_dataset(df, base_path, csv=True):
+    """
+    Store df as base_path + ".parquet" (when pyarrow is installed) and, unless
+    csv=False, as a CSV export for humans. Files are replaced atomically.
+    """
+    df = apply_schema(df.copy())
+    # The CSV goes first, so the Parquet file is never older than its export
+    if csv:
+        tmp_path = base_path + ".csv.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, base_path + ".csv")
+    if PARQUET_AVAILABLE:
+        tmp_path = base_path + ".parquet.tmp"
+        df.to_parquet(tmp_path, index=False, engine="pyarrow")
+        os.replace(tmp_path, base_path + ".parquet")
+    return df
+
+def convert_csv(base_path):
+    """Write the Parquet copy of a CSV produced outside of write_dataset."""
+    if PARQUET_AVAILABLE:
+        write_dataset(read_csv(base_path + ".csv"), base_path, csv=False)
@@ -1,8 +1,24 @@
-import requests
+import argparse
 import json
 import os
-import time
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import RateLimiter, client
+from metrics import recorder
+
+# Overridable to run against a local stand-in (see benchmarks/mock_server.py)
+CROSSREF_URL = os.environ.get("CROSSREF_API_URL", "https://api.crossref.org")
+# Contact address sent with every request, which routes them to CrossRef's "polite" pool
+CROSSREF_MAILTO = os.environ.get("CROSSREF_MAILTO")
+RATE_LIMIT = 5  # Requests per second, well below CrossRef's public limit
+BATCH_SIZE = 20  # DOIs per filter=doi:... query
+WORKERS = 4
+CACHE_VERSION = 2
+ERROR_TTL_HOURS = 6  # Failed DOIs are retried once their cache entry is older
+
+rate_limiter = RateLimiter(RATE_LIMIT)
 
 def escape_latex(text):
     """Escapes special LaTeX characters."""
@@ -57,87 +73,224 @@ def convert_html_to_latex(text):
             
     return ''.join(escaped_parts)
 
+def crossref_get(path, endpoint, params=None):
+    """GET a CrossRef API path under the shared rate limit; returns the 'message' of the response."""
+    params = dict(params or {})
+    if CROSSREF_MAILTO:
+        params["mailto"] = CROSSREF_MAILTO
+    response = client.get(f"{CROSSREF_URL.rstrip('/')}/{path}", params=params, endpoint=endpoint,
+                          limiter=rate_limiter, timeout=10)
+    return response.json()['message']
+
+def fetch_metadata(doi):
+    """CrossRef work record of one DOI."""
+    return crossref_get(f"works/{doi}", "crossref/works")
+
+def fetch_metadata_batch(dois):
+    """
+    CrossRef work records of several DOIs with one filter query. Returns a dict
+    keyed by the requested DOI; DOIs CrossRef did not return are missing.
+    """
+    message = crossref_get("works", "crossref/works-batch",
+                           {"filter": ",".join(f"doi:{doi}" for doi in dois), "rows": len(dois)})
+    # CrossRef returns DOIs lowercased
+    by_doi = {item.get('DOI', '').lower(): item for item in message.get('items', [])}
+    return {doi: by_doi[doi.lower()] for doi in dois if doi.lower() in by_doi}
+
+def fallback_citation(doi):
+    """Citation of a DOI whose metadata could not be fetched."""
+    return f"DOI: \\href{{https://doi.org/{doi}}}{{{doi}}}"
+
+def format_citation(item, doi):
+    """Format a CrossRef work record as a LaTeX citation."""
+    # Extract fields
+    title = item.get('title', [''])[0]
+    container_title = item.get('container-title', [''])[0] # Journal
+    published = item.get('published-print', item.get('published-online', {}))
+    year = published.get('date-parts', [[None]])[0][0]
+    
+    # Clean and Escape
+    title = convert_html_to_latex(title)
+    container_title = convert_html_to_latex(container_title)
+    
+    authors = []
+    if 'author' in item:
+        for author in item['author']:
+            family = author.get('family', '')
+            given = author.get('given', '')
+            if family:
+                # Escape author names too
+                family = escape_latex(family)
+                given = escape_latex(given)
+                authors.append(f"{family} {given[0] if given else ''}.")
+    
+    if len(authors) > 2:
+        author_str = f"{authors[0]} et al."
+    elif len(authors) == 2:
+        author_str = f"{authors[0]} and {authors[1]}"
+    elif len(authors) == 1:
+        author_str = authors[0]
+    else:
+        author_str = "Unknown"
+
+    # Format: Author (Year). Title. Journal. DOI
+    citation = f"{author_str} ({year}). {title}. \\textit{{{container_title}}}. DOI: \\href{{https://doi.org/{doi}}}{{{doi}}}"
+    return citation
+
 def fetch_citation(doi):
     """Fetch citation data from CrossRef API."""
-    url = f"https://api.crossref.org/works/{doi}"
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        item = data['message']
-        
-        # Extract fields
-        title = item.get('title', [''])[0]
-        container_title = item.get('container-title', [''])[0] # Journal
-        published = item.get('published-print', item.get('published-online', {}))
-        year = published.get('date-parts', [[None]])[0][0]
-        
-        # Clean and Escape
-        title = convert_html_to_latex(title)
-        container_title = convert_html_to_latex(container_title)
-        
-        authors = []
-        if 'author' in item:
-            for author in item['author']:
-                family = author.get('family', '')
-                given = author.get('given', '')
-                if family:
-                    # Escape author names too
-                    family = escape_latex(family)
-                    given = escape_latex(given)
-                    authors.append(f"{family} {given[0] if given else ''}.")
-        
-        if len(authors) > 2:
-            author_str = f"{authors[0]} et al."
-        elif len(authors) == 2:
-            author_str = f"{authors[0]} and {authors[1]}"
-        elif len(authors) == 1:
-            author_str = authors[0]
+        return format_citation(fetch_metadata(doi), doi)
+    except Exception as e:
+        print(f"Error fetching {doi}: {e}")
+        return fallback_citation(doi)
+
+def ok_entry(item):
+    # The reference list of a work can be long and is never rendered
+    return {"status": "ok", "fetched": time.time(),
+            "metadata": {key: value for key, value in item.items() if key != 'reference'}}
+
+def error_entry(error):
+    return {"status": "error", "fetched": time.time(), "error": str(error)}
+
+def fetch_entries(dois, workers=WORKERS, batch_size=BATCH_SIZE):
+    """
+    Cache entries of many DOIs, keyed by DOI. DOIs are resolved in batches of
+    batch_size per CrossRef filter query, by `workers` concurrent requests under
+    the shared rate limit; DOIs a batch did not return are fetched one by one.
+    """
+    dois = list(dict.fromkeys(dois))
+    # A comma would split the filter value, so such DOIs are always fetched alone
+    batchable = [doi for doi in dois if "," not in doi]
+    batches = [batchable[i:i + batch_size] for i in range(0, len(batchable), batch_size)] if batch_size > 1 else []
+
+    def resolve_batch(batch):
+        try:
+            return fetch_metadata_batch(batch)
+        except Exception as e:
+            print(f"Error fetching a batch of {len(batch)} DOIs: {e}")
+            return {}
+
+    def resolve(doi):
+        try:
+            return ok_entry(fetch_metadata(doi))
+        except Exception as e:
+            print(f"Error fetching {doi}: {e}")
+            return error_entry(e)
+
+    entries = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for items in pool.map(resolve_batch, batches):
+            entries.update((doi, ok_entry(item)) for doi, item in items.items())
+        remaining = [doi for doi in dois if doi not in entries]
+        entries.update(zip(remaining, pool.map(resolve, remaining)))
+    return {doi: entries[doi] for doi in dois}
+
+def migrate_cache(data):
+    """
+    Entries of a cache file. The old format mapped each DOI straight to its
+    formatted citation: those citations are kept as "legacy" entries until the
+    next online run refetches their metadata, except bare DOI fallbacks, which
+    become expired failures and are fetched again.
+    """
+    if data.get("version") == CACHE_VERSION:
+        return data["entries"]
+    entries = {}
+    for doi, citation in data.items():
+        if citation == fallback_citation(doi):
+            entries[doi] = {"status": "error", "fetched": 0, "error": "cached fallback citation"}
         else:
-            author_str = "Unknown"
+            entries[doi] = {"status": "legacy", "citation": citation}
+    return entries
 
-        # Format: Author (Year). Title. Journal. DOI
-        citation = f"{author_str} ({year}). {title}. \\textit{{{container_title}}}. DOI: \\href{{https://doi.org/{doi}}}{{{doi}}}"
-        return citation
-        
+def load_cache(cache_path):
+    """Cache entries and whether the file has to be rewritten in the current format."""
+    if not os.path.exists(cache_path):
+        return {}, False
+    with open(cache_path, "r") as f:
+        data = json.load(f)
+    return migrate_cache(data), data.get("version") != CACHE_VERSION
+
+def save_cache(cache_path, entries):
+    """Write the cache atomically, so an interrupted run cannot leave it truncated."""
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": CACHE_VERSION, "entries": entries}, f, indent=4)
+    os.replace(tmp_path, cache_path)
+
+def needs_fetch(entry, now=None):
+    """
+    Whether a cache entry is missing, or a failure or legacy entry not attempted
+    within ERROR_TTL_HOURS (legacy entries from the migration were never attempted).
+    """
+    if entry is None:
+        return True
+    if entry["status"] in ("error", "legacy"):
+        return (now or time.time()) - entry.get("fetched", 0) > ERROR_TTL_HOURS * 3600
+    return False
+
+def render_entry(entry, doi):
+    """Formatted citation of a cache entry (the DOI link alone if it has no metadata)."""
+    if entry is None or entry["status"] == "error":
+        return fallback_citation(doi)
+    if entry["status"] == "legacy":
+        return entry["citation"]
+    try:
+        return format_citation(entry["metadata"], doi)
     except Exception as e:
-        print(f"Error fetching {doi}: {e}")
-        return f"DOI: \\href{{https://doi.org/{doi}}}{{{doi}}}"
+        print(f"Error formatting {doi}: {e}")
+        return fallback_citation(doi)
 
-def get_bibliography(config_path="config_dois.json", cache_path="bibliography_cache.json"):
-    """Load DOIs from config and fetch citations."""
+def get_bibliography(config_path="config_dois.json", cache_path="bibliography_cache.json", workers=WORKERS,
+                     offline=False):
+    """
+    Load DOIs from config and return the formatted citations per gene. DOIs missing
+    from the cache, failures older than ERROR_TTL_HOURS and legacy (preformatted)
+    entries are fetched first, unless offline; citations are always formatted from
+    the cached metadata.
+    """
     with open(config_path, "r") as f:
         doi_config = json.load(f)
         
-    if os.path.exists(cache_path):
-        with open(cache_path, "r") as f:
-            cache = json.load(f)
-    else:
-        cache = {}
-        
-    results = {}
-    
-    for gene, dois in doi_config.items():
-        results[gene] = []
-        for doi in dois:
-            if doi in cache:
-                results[gene].append(cache[doi])
-            else:
-                print(f"Fetching {doi}...")
-                citation = fetch_citation(doi)
-                cache[doi] = citation
-                results[gene].append(citation)
-                time.sleep(0.5) # Be nice to API
-                
-    with open(cache_path, "w") as f:
-        json.dump(cache, f, indent=4)
+    cache, changed = load_cache(cache_path)
         
-    return results
+    # DOIs shared by several genes are fetched once
+    dois = dict.fromkeys(doi for dois in doi_config.values() for doi in dois)
+    stale = [doi for doi in dois if needs_fetch(cache.get(doi))]
+    if stale and not offline:
+        print(f"Fetching {len(stale)} DOIs...")
+        for doi, entry in fetch_entries(stale, workers=workers).items():
+            # A failed upgrade keeps the old citation until the next attempt is due
+            if entry["status"] == "error" and cache.get(doi, {}).get("status") == "legacy":
+                entry = dict(cache[doi], fetched=entry["fetched"])
+            cache[doi] = entry
+            changed = True
+    elif stale:
+        print(f"Offline: {len(stale)} DOIs without metadata are cited by their DOI link or old citation")
+
+    if changed:
+        save_cache(cache_path, cache)
+
+    return {gene: [render_entry(cache.get(doi), doi) for doi in dois] for gene, dois in doi_config.items()}
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch citations of the configured DOIs from CrossRef.")
+    parser.add_argument("--base-url", default=CROSSREF_URL,
+                        help="CrossRef API base URL (default: $CROSSREF_API_URL or api.crossref.org)")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"Number of concurrent CrossRef requests (default: {WORKERS})")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only format the cached metadata, without any request")
+    args = parser.parse_args()
+    CROSSREF_URL = args.base_url
+
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     config_path = os.path.join(base_dir, "config", "config_dois.json")
     cache_path = os.path.join(base_dir, "cache", "bibliography_cache.json")
     
-    bib = get_bibliography(config_path, cache_path)
+    with recorder.stage("bibliography") as stage:
+        bib = get_bibliography(config_path, cache_path, workers=args.workers, offline=args.offline)
+        stage["rows_out"] = len(bib)
     print(f"Loaded {len(bib)} genes from bibliography.")
+    client.print_report()
+    print(f"Metrics saved to {recorder.save('bibliography')}")
@@ -1,17 +1,46 @@
-import requests
 import xml.etree.ElementTree as ET
 import csv
-import time
+import io
+import json
 import sys
 import os
 import shutil
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+from clinvar_diff import diff_snapshots
+from clinvar_tables import convert_results
+from http_client import RateLimiter, client
+from metrics import recorder
+from response_cache import ResponseCache
 
 # Constants
-BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+DEFAULT_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+# Overridable to run against a local stand-in (see benchmarks/mock_server.py)
+BASE_URL = os.environ.get("NCBI_EUTILS_URL", DEFAULT_BASE_URL)
 DB = "clinvar"
 RETMAX = 100  # Batch size for efetch
-SLEEP_TIME = 0.5  # Respect NCBI rate limits
+ESEARCH_MAX = 10000  # Maximum retmax accepted by esearch
+# NCBI rate limits (requests per second), see E-utilities usage guidelines
+RATE_LIMIT = 3
+RATE_LIMIT_WITH_KEY = 10
+API_KEY = os.environ.get("NCBI_API_KEY")
+RESPONSE_CACHE_DIR = "cache/responses"
+CACHE_TTL_HOURS = 24
+CACHE_MAX_SIZE_MB = 500
+CHANGELOG_BASE = "cache/clinvar_changes"  # Submission-level diff against the previous run (.csv/.json)
+CHANGE_LABELS = {
+    "added": "Added Submissions",
+    "removed": "Removed Submissions",
+    "reclassified": "Reclassified Submissions",
+    "date_changed": "Submissions with Changed Dates",
+    "metadata_changed": "Submissions with Changed Metadata",
+}
 
 # Gene list with aliases
 GENES = [
@@ -23,38 +52,158 @@ GENES = [
     "FOXF1", "TBX4", "FGF10", "PSMD12", "TRIP12"
 ]
 
-def esearch(term):
-    """Search for variants and return list of UIDs."""
-    url = f"{BASE_URL}esearch.fcgi"
+# Output columns of clinvar_results.csv
+FIELDNAMES = [
+    "Gene", "Phenotype", "Classification", "Variant (HGVS)", 
+    "Date Created", "Submitter", "Consequence", "Review Status",
+    "Variation ID", "VCV Accession", "Submission Accession", "Submission Version"
+]
+# One output row, with the columns of FIELDNAMES in the same order. Tuples take a
+# fraction of the memory of dicts and go to csv.writer as they are.
+Row = namedtuple("Row", [
+    "gene", "phenotype", "classification", "variant", "date_created", "submitter",
+    "consequence", "review_status", "variation_id", "vcv_accession", "submission_accession", "submission_version"
+])
+# Low-cardinality columns, whose values are interned so that the rows share one string per value
+INTERNED_FIELDS = ["Gene", "Phenotype", "Classification", "Submitter", "Consequence", "Review Status"]
+WRITE_BATCH = 1000  # Rows handed to the CSV writer at a time
+
+rate_limiter = RateLimiter(RATE_LIMIT_WITH_KEY if API_KEY else RATE_LIMIT)
+
+response_cache = None  # ResponseCache, see configure()
+history_terms = {}  # (WebEnv, query_key) -> search term, for stable cache keys
+
+def configure(api_key=None, cache=None, base_url=None):
+    """
+    Set the NCBI API key, response cache and (optionally) E-utilities base URL,
+    adjusting the shared rate limiter accordingly.
+    """
+    global API_KEY, BASE_URL, rate_limiter, response_cache
+    API_KEY = api_key
+    rate_limiter = RateLimiter(RATE_LIMIT_WITH_KEY if api_key else RATE_LIMIT)
+    response_cache = cache
+    if base_url:
+        BASE_URL = base_url if base_url.endswith("/") else base_url + "/"
+
+def with_api_key(params):
+    """Add the API key (if configured) to request parameters."""
+    if API_KEY:
+        params["api_key"] = API_KEY
+    return params
+
+def cache_params(params):
+    """
+    Request parameters identifying a cached response. History server references
+    (WebEnv/query_key) differ on every run, so they are replaced by the search term.
+    """
+    params = dict(params)
+    webenv = params.pop("WebEnv", None)
+    if webenv is not None:
+        query_key = params.pop("query_key", None) or params.pop("term")[1:]
+        params["history_term"] = history_terms.get((webenv, str(query_key)), webenv)
+    # Responses of another server must not be replayed as NCBI ones
+    if BASE_URL != DEFAULT_BASE_URL:
+        params["base_url"] = BASE_URL
+    return params
+
+def eutils_request(endpoint, params, post=False, stream=False):
+    """
+    Send an E-utilities request and return the response content (or a file-like
+    body with stream=True). Responses are served from and stored in the response
+    cache when one is configured; in offline mode a cache miss raises LookupError.
+    Searches and History server requests are never served from the cache online:
+    a replayed search would hide changes made since it was stored (and carry a
+    WebEnv that may have expired), so they are only stored for offline replays.
+    Other responses are keyed by their parameters (the ID list, not the record
+    versions), so a changed record is picked up once its entry expires.
+    """
+    key_params = cache_params(params)
+    volatile = endpoint == "esearch.fcgi" or "WebEnv" in params
+    if response_cache is not None and (response_cache.offline or not volatile):
+        content = response_cache.get(endpoint, key_params)
+        if content is None and response_cache.offline:
+            raise LookupError(f"{endpoint} response not in cache (offline mode)")
+        if content is not None:
+            return io.BytesIO(content) if stream else content
+
+    url = f"{BASE_URL}{endpoint}"
+    # The whole body is needed to store it in the cache
+    stream_body = stream and response_cache is None
+    if post:
+        response = client.post(url, data=with_api_key(params), stream=stream_body,
+                               endpoint=f"eutils/{endpoint}", limiter=rate_limiter)
+    else:
+        response = client.get(url, params=with_api_key(params), stream=stream_body,
+                              endpoint=f"eutils/{endpoint}", limiter=rate_limiter)
+    if stream_body:
+        response.raw.decode_content = True
+        return response.raw
+    # A truncated efetch body would be replayed from the cache on every later run
+    complete = endpoint != "efetch.fcgi" or response.content.rstrip().endswith(b"</ClinVarResult-Set>")
+    if response_cache is not None and complete:
+        response_cache.put(endpoint, key_params, response.content)
+    return io.BytesIO(response.content) if stream else response.content
+
+def esearch_history(term, retmax=0, mindate=None, maxdate=None):
+    """
+    Search for variants, keeping the result set on the History server.
+    Returns (count, webenv, query_key, uids) where uids holds the first retmax UIDs.
+    mindate/maxdate (YYYY/MM/DD) restrict the search to records modified in that window.
+    """
     params = {
         "db": DB,
         "term": term,
         "retmode": "json",
-        "retmax": 10000,
+        "retmax": retmax,
         "usehistory": "y"
     }
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
+    if mindate:
+        params["datetype"] = "mdat"
+        params["mindate"] = mindate
+        params["maxdate"] = maxdate or datetime.now().strftime("%Y/%m/%d")
+    data = json.loads(eutils_request("esearch.fcgi", params))["esearchresult"]
     
-    count = int(data["esearchresult"]["count"])
+    count = int(data["count"])
+    webenv, query_key = data.get("webenv"), data.get("querykey")
+    history_terms[(webenv, str(query_key))] = json.dumps(cache_params(params), sort_keys=True)
+    return count, webenv, query_key, data.get("idlist", [])
+
+def esearch_page(webenv, query_key, retstart, retmax=ESEARCH_MAX):
+    """Return one page of UIDs from a result set stored on the History server."""
+    params = {
+        "db": DB,
+        "term": f"#{query_key}",
+        "WebEnv": webenv,
+        "retmode": "json",
+        "retstart": retstart,
+        "retmax": retmax,
+        "usehistory": "y"
+    }
+    data = json.loads(eutils_request("esearch.fcgi", params))
+    return data["esearchresult"].get("idlist", [])
+
+def esearch(term, mindate=None, maxdate=None):
+    """Search for variants and return list of UIDs (all pages, past the esearch retmax cap)."""
+    count, webenv, query_key, id_list = esearch_history(term, ESEARCH_MAX, mindate, maxdate)
     if count == 0:
         return []
-        
-    id_list = data["esearchresult"]["idlist"]
+    
+    id_list = list(id_list)
+    while len(id_list) < count:
+        page = esearch_page(webenv, query_key, len(id_list))
+        if not page:
+            break
+        id_list.extend(page)
     return id_list
 
 def esummary_batch(uids):
     """Fetch summary for a batch of UIDs to get VCV accessions."""
-    url = f"{BASE_URL}esummary.fcgi"
     params = {
         "db": DB,
         "id": ",".join(uids),
         "retmode": "json"
     }
-    response = requests.post(url, data=params)
-    response.raise_for_status()
-    data = response.json()
+    data = json.loads(eutils_request("esummary.fcgi", params, post=True))
     
     vcv_accessions = []
     if "result" in data:
@@ -65,263 +214,544 @@ def esummary_batch(uids):
                     vcv_accessions.append(accession)
     return vcv_accessions
 
-def efetch_batch_vcv(vcv_ids):
-    """Fetch VCV XML for a batch of VCV IDs."""
-    url = f"{BASE_URL}efetch.fcgi"
+def efetch_batch_vcv(vcv_ids, is_variationid=False, stream=False):
+    """
+    Fetch VCV XML for a batch of VCV IDs.
+    With is_variationid=True the IDs are Variation IDs (esearch UIDs) instead of VCV accessions.
+    With stream=True a file-like response body is returned instead of bytes.
+    """
     params = {
         "db": DB,
         "id": ",".join(vcv_ids),
         "rettype": "vcv",
         "retmode": "xml"
     }
-    response = requests.post(url, data=params)
-    response.raise_for_status()
-    return response.content
+    if is_variationid:
+        params["is_variationid"] = "true"
+    return eutils_request("efetch.fcgi", params, post=True, stream=stream)
+
+def efetch_history_vcv(webenv, query_key, retstart, retmax=RETMAX, stream=False):
+    """Fetch VCV XML for one page of a result set stored on the History server."""
+    params = {
+        "db": DB,
+        "WebEnv": webenv,
+        "query_key": query_key,
+        "retstart": retstart,
+        "retmax": retmax,
+        "rettype": "vcv",
+        "retmode": "xml",
+        "is_variationid": "true"
+    }
+    return eutils_request("efetch.fcgi", params, post=True, stream=stream)
+
+def intern_text(value):
+    """The interned string of value (None, e.g. an empty XML element, is kept as is)."""
+    return sys.intern(value) if value is not None else None
+
+def parse_archive(archive, target_gene):
+    """Yield extracted rows (Row) for a single VariationArchive element."""
+
+    # New Columns
+    variation_id = archive.get("VariationID", "N/A")
+    vcv_accession = archive.get("Accession", "N/A")
+
+    # Basic Variant Info from ClassifiedRecord/SimpleAllele
+    classified_record = archive.find("ClassifiedRecord")
+    if classified_record is None:
+        return
+        
+    simple_allele = classified_record.find("SimpleAllele")
+    if simple_allele is None:
+        return
+        
+    # Variant Name
+    variant_name = "N/A"
+    name_node = simple_allele.find("Name")
+    if name_node is not None:
+        variant_name = name_node.text
+        
+    # Consequence (MolecularConsequence)
+    molecular_consequence = "N/A"
+    # Try to find in HGVS list
+    hgvs_list = simple_allele.find("HGVSlist")
+    if hgvs_list is not None:
+        for hgvs in hgvs_list.findall("HGVS"):
+            mol_cons = hgvs.find("MolecularConsequence")
+            if mol_cons is not None:
+                molecular_consequence = intern_text(mol_cons.get("Type"))
+                break # Take the first one
+    
+    # Iterate over ClinicalAssertionList (Submissions)
+    assertion_list = classified_record.find("ClinicalAssertionList")
+    if assertion_list is None:
+        return
+        
+    for assertion in assertion_list.findall("ClinicalAssertion"):
+        
+        # Check Classification
+        classification_node = assertion.find("Classification")
+        if classification_node is None:
+            continue
+        
+        # Look for GermlineClassification
+        germline_class = classification_node.find("GermlineClassification")
+        if germline_class is not None:
+            classification_text = germline_class.text
+        else:
+            # Fallback to Description if GermlineClassification is missing (rare for Pathogenic)
+            desc = classification_node.find("Description")
+            if desc is not None:
+                classification_text = desc.text
+            else:
+                classification_text = "N/A"
+        
+        classification_text = intern_text(classification_text)
+        classification_lower = classification_text.lower()
+        
+        # Filter for Pathogenic / Likely Pathogenic
+        if not ("pathogenic" in classification_lower or "likely pathogenic" in classification_lower):
+            continue
+        
+        # Submitter
+        submitter = "N/A"
+        submission_accession = "N/A"
+        submission_version = ""
+        date_created = "N/A"
+        accession_node = assertion.find("ClinVarAccession")
+        if accession_node is not None:
+            submitter = intern_text(accession_node.get("SubmitterName", "N/A"))
+            submission_accession = accession_node.get("Accession", "N/A")
+            submission_version = accession_node.get("Version", "")
+            date_created = accession_node.get("DateCreated", "N/A")
+        
+        final_date = date_created #if date_created else submission_date
+        if not final_date:
+             final_date = "N/A"
+        
+        # Review Status
+        review_status = "N/A"
+        review_node = classification_node.find("ReviewStatus")
+        if review_node is not None:
+            review_status = intern_text(review_node.text)
+        
+        # Phenotypes (Trait)
+        traits = []
+        trait_set = assertion.find("TraitSet")
+        if trait_set is not None:
+            for trait in trait_set.findall("Trait"):
+                # Get preferred name
+                name_node = trait.find(".//Name/ElementValue[@Type='Preferred']")
+                if name_node is not None:
+                    traits.append(intern_text(name_node.text))
+                else:
+                    # Try any name
+                    name_node = trait.find(".//Name/ElementValue")
+                    if name_node is not None:
+                        traits.append(intern_text(name_node.text))
+        
+        if not traits:
+            traits = ["Not Provided"]
+        
+        # Flatten: One row per phenotype
+        for phenotype in traits:
+            yield Row(target_gene, phenotype, classification_text, variant_name, final_date, submitter,
+                      molecular_consequence, review_status, variation_id, vcv_accession,
+                      submission_accession, submission_version)
+
+def iter_vcv_xml(source, target_gene):
+    """
+    Incrementally parse VCV XML from a file-like object (e.g. an HTTP response stream)
+    and yield extracted rows. Each VariationArchive is freed once processed, so memory
+    stays bounded regardless of batch size. Raises ET.ParseError on malformed XML.
+    """
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        # Root is ClinVarResult-Set, children are VariationArchive
+        if depth == 1 and elem.tag == "VariationArchive":
+            yield from parse_archive(elem, target_gene)
+            root.clear()
 
 def parse_vcv_xml(xml_content, target_gene):
     """Parse VCV XML content and yield extracted rows."""
+    if isinstance(xml_content, str):
+        source = io.StringIO(xml_content)
+    else:
+        source = io.BytesIO(xml_content)
     try:
-        root = ET.fromstring(xml_content)
+        # Malformed content yields no rows at all, as with a whole-document parse
+        rows = list(iter_vcv_xml(source, target_gene))
     except ET.ParseError as e:
         print(f"Error parsing XML: {e}", file=sys.stderr)
         return
+    yield from rows
 
-    # Root is ClinVarResult-Set, children are VariationArchive
-    for archive in root.findall("VariationArchive"):
-        
-        # New Columns
-        variation_id = archive.get("VariationID", "N/A")
-        vcv_accession = archive.get("Accession", "N/A")
+def write_rows(f, rows, header=True, batch_size=WRITE_BATCH):
+    """
+    Write rows (Row, or any sequences in FIELDNAMES order) to an open CSV file, in
+    batches of batch_size. Returns the number of rows written.
+    """
+    writer = csv.writer(f)
+    if header:
+        writer.writerow(FIELDNAMES)
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return count
+        writer.writerows(batch)
+        count += len(batch)
 
-        # Basic Variant Info from ClassifiedRecord/SimpleAllele
-        classified_record = archive.find("ClassifiedRecord")
-        if classified_record is None:
-            continue
-            
-        simple_allele = classified_record.find("SimpleAllele")
-        if simple_allele is None:
-            continue
-            
-        # Variant Name
-        variant_name = "N/A"
-        name_node = simple_allele.find("Name")
-        if name_node is not None:
-            variant_name = name_node.text
-            
-        # Consequence (MolecularConsequence)
-        molecular_consequence = "N/A"
-        # Try to find in HGVS list
-        hgvs_list = simple_allele.find("HGVSlist")
-        if hgvs_list is not None:
-            for hgvs in hgvs_list.findall("HGVS"):
-                mol_cons = hgvs.find("MolecularConsequence")
-                if mol_cons is not None:
-                    molecular_consequence = mol_cons.get("Type")
-                    break # Take the first one
-        
-        # Iterate over ClinicalAssertionList (Submissions)
-        assertion_list = classified_record.find("ClinicalAssertionList")
-        if assertion_list is None:
-            continue
-            
-        for assertion in assertion_list.findall("ClinicalAssertion"):
-            
-            # Check Classification
-            classification_node = assertion.find("Classification")
-            if classification_node is None:
-                continue
-            
-            # Look for GermlineClassification
-            germline_class = classification_node.find("GermlineClassification")
-            if germline_class is not None:
-                classification_text = germline_class.text
-            else:
-                # Fallback to Description if GermlineClassification is missing (rare for Pathogenic)
-                desc = classification_node.find("Description")
-                if desc is not None:
-                    classification_text = desc.text
-                else:
-                    classification_text = "N/A"
-            
-            classification_lower = classification_text.lower()
-            
-            # Filter for Pathogenic / Likely Pathogenic
-            if not ("pathogenic" in classification_lower or "likely pathogenic" in classification_lower):
-                continue
-            
-            # Submitter
-            submitter = "N/A"
-            submission_accession = "N/A"
-            date_created = "N/A"
-            accession_node = assertion.find("ClinVarAccession")
-            if accession_node is not None:
-                submitter = accession_node.get("SubmitterName", "N/A")
-                submission_accession = accession_node.get("Accession", "N/A")
-                date_created = accession_node.get("DateCreated", "N/A")
-            
-            final_date = date_created #if date_created else submission_date
-            if not final_date:
-                 final_date = "N/A"
-            
-            # Review Status
-            review_status = "N/A"
-            review_node = classification_node.find("ReviewStatus")
-            if review_node is not None:
-                review_status = review_node.text
-            
-            # Phenotypes (Trait)
-            traits = []
-            trait_set = assertion.find("TraitSet")
-            if trait_set is not None:
-                for trait in trait_set.findall("Trait"):
-                    # Get preferred name
-                    name_node = trait.find(".//Name/ElementValue[@Type='Preferred']")
-                    if name_node is not None:
-                        traits.append(name_node.text)
-                    else:
-                        # Try any name
-                        name_node = trait.find(".//Name/ElementValue")
-                        if name_node is not None:
-                            traits.append(name_node.text)
-            
-            if not traits:
-                traits = ["Not Provided"]
-            
-            # Flatten: One row per phenotype
-            for phenotype in traits:
-                yield {
-                    "Gene": target_gene,
-                    "Phenotype": phenotype,
-                    "Classification": classification_text,
-                    "Variant (HGVS)": variant_name,
-                    "Date Created": final_date,
-                    "Submitter": submitter,
-                    "Consequence": molecular_consequence,
-                    "Review Status": review_status,
-                    "Variation ID": variation_id,
-                    "VCV Accession": vcv_accession,
-                    "Submission Accession": submission_accession
-                }
-
-def compare_results(old_file, new_file):
-    """Compare old and new CSV files and print differences."""
+def read_rows(f, header=True):
+    """
+    Yield the rows (Row) of an open CSV file written by write_rows. Columns missing
+    from the header of an older file are empty; without a header the columns are
+    those of FIELDNAMES.
+    """
+    reader = csv.reader(f)
+    get = None
+    if header:
+        names = next(reader, [])
+        # Missing columns point past the end of the row, where an empty value is appended
+        get = itemgetter(*[names.index(field) if field in names else len(names) for field in FIELDNAMES])
+    interned = [field in INTERNED_FIELDS for field in FIELDNAMES]
+    for values in reader:
+        if get is not None:
+            values.append("")
+            values = get(values)
+        yield Row._make([sys.intern(value) if intern else value for value, intern in zip(values, interned)])
+
+def compare_results(old_file, new_file, changelog_base=None):
+    """
+    Compare old and new results CSVs at submission level (see clinvar_diff.py), print
+    a summary and write the changelog to changelog_base + ".csv"/".json" (when given).
+    Returns the summary.
+    """
     if not os.path.exists(old_file):
         print("No previous results to compare with.")
-        return
+        return None
 
     print("\n--- Comparison with Previous Run ---")
-    
+    summary, samples = diff_snapshots(old_file, new_file, changelog_base)
+    counts = summary["changes"]
+    print(f"Submissions: {summary['submissions']['old']} -> {summary['submissions']['new']}")
+    if not any(counts.values()):
+        print("No changes in submissions.")
+    for kind, changes in samples.items():
+        if not counts[kind]:
+            continue
+        print(f"{CHANGE_LABELS[kind]} ({counts[kind]}):")
+        for change in changes:
+            submission = f"{change['Gene']}: {change['VCV Accession']} {change['Submission Accession']}"
+            if kind == "added":
+                print(f"  + {submission} ({change['New']})")
+            elif kind == "removed":
+                print(f"  - {submission} ({change['Old']})")
+            else:
+                print(f"  {submission} {change['Field']}: {change['Old']} -> {change['New']}")
+        if counts[kind] > len(changes):
+            print(f"  ... {counts[kind] - len(changes)} more")
+    if changelog_base is not None:
+        print(f"Changelog saved to {summary['changelog']}")
+    print("------------------------------------\n")
+    return summary
+
+def gene_term(gene):
+    """E-utilities query for Pathogenic/Likely Pathogenic variants of a gene."""
+    return f"{gene}[Gene Name] AND (pathogenic[Clinical Significance] OR likely pathogenic[Clinical Significance])"
+
+def search_gene(gene):
+    """Search a gene and return its UIDs (legacy esummary path), None on failure."""
     try:
-        # Load data
-        # We use a set of tuples to identify unique rows: (Gene, Variant (HGVS), VCV Accession, Submission Accession)
-        # This combination should be unique enough for a 'submission'
-        
-        def load_keys(filepath):
-            keys = set()
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # Use VCV Accession as primary key for "Variant" level diff
-                    # Use (VCV Accession, Submission Accession) for "Submission" level diff
-                    # Let's track Variants (VCV)
-                    vcv = row.get("VCV Accession")
-                    gene = row.get("Gene")
-                    if vcv and gene:
-                        keys.add((gene, vcv))
-            return keys
-
-        old_keys = load_keys(old_file)
-        new_keys = load_keys(new_file)
-        
-        added = new_keys - old_keys
-        removed = old_keys - new_keys
-        
-        if not added and not removed:
-            print("No changes in variants (VCV level).")
+        uids = esearch(gene_term(gene))
+    except Exception as e:
+        print(f"Failed to search for {gene}: {e}")
+        return None
+    print(f"  {gene}: found {len(uids)} variants (UIDs).")
+    return uids
+
+def search_gene_history(gene):
+    """Search a gene on the History server. Returns (count, webenv, query_key), None on failure."""
+    try:
+        count, webenv, query_key, _ = esearch_history(gene_term(gene))
+    except Exception as e:
+        print(f"Failed to search for {gene}: {e}")
+        return None
+    print(f"  {gene}: found {count} variants (UIDs).")
+    return count, webenv, query_key
+
+def fetch_batch(gene, batch_uids, batch_start):
+    """Fetch and parse one batch of UIDs via esummary + efetch. Returns list of rows, None on failure."""
+    try:
+        # 1. Get VCV Accessions
+        vcv_ids = esummary_batch(batch_uids)
+        if not vcv_ids:
+            return []
+
+        # 2. Fetch XML for VCVs and parse it while it downloads
+        with closing(efetch_batch_vcv(vcv_ids, stream=True)) as stream:
+            return list(iter_vcv_xml(stream, gene))
+    except Exception as e:
+        print(f"  Error processing {gene} batch {batch_start}: {e}")
+        return None
+
+def fetch_history_batch(gene, webenv, query_key, retstart):
+    """
+    Fetch and parse one page of a History server result set. Returns list of rows, None on failure.
+    Falls back to fetching the page by Variation ID if the history efetch fails.
+    """
+    try:
+        with closing(efetch_history_vcv(webenv, query_key, retstart, stream=True)) as stream:
+            return list(iter_vcv_xml(stream, gene))
+    except Exception as e:
+        print(f"  History fetch failed for {gene} batch {retstart} ({e}), retrying by Variation ID...")
+    try:
+        uids = esearch_page(webenv, query_key, retstart, RETMAX)
+        if not uids:
+            return []
+        with closing(efetch_batch_vcv(uids, is_variationid=True, stream=True)) as stream:
+            return list(iter_vcv_xml(stream, gene))
+    except Exception as e:
+        print(f"  Error processing {gene} batch {retstart}: {e}")
+        return None
+
+def fetch_id_batch(gene, uids, batch_start):
+    """Fetch and parse one batch of Variation IDs directly. Returns list of rows, None on failure."""
+    try:
+        with closing(efetch_batch_vcv(uids, is_variationid=True, stream=True)) as stream:
+            return list(iter_vcv_xml(stream, gene))
+    except Exception as e:
+        print(f"  Error processing {gene} batch {batch_start}: {e}")
+        return None
+
+def fetch_all(genes, workers=1, use_history=True, failed=None):
+    """
+    Fetch rows for all genes, yielding them in gene/batch order.
+    With workers > 1 genes and batches are fetched concurrently; the shared
+    rate limiter keeps the whole process under the NCBI request rate.
+    By default batches are paged from the History server with a single efetch
+    each; use_history=False restores the esearch + esummary + efetch path.
+    Genes with a failed search or batch are added to the optional `failed` set.
+    """
+    if failed is None:
+        failed = set()
+    batch_size = RETMAX
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Searches first, so that all batches can be scheduled at once
+        futures = []
+        if use_history:
+            searches = list(pool.map(search_gene_history, genes))
+            for gene, search in zip(genes, searches):
+                if search is None:
+                    failed.add(gene)
+                    continue
+                count, webenv, query_key = search
+                for i in range(0, count, batch_size):
+                    futures.append((gene, pool.submit(fetch_history_batch, gene, webenv, query_key, i)))
         else:
-            if added:
-                print(f"Added Variants ({len(added)}):")
-                for gene, vcv in added:
-                    print(f"  + {gene}: {vcv}")
-            
-            if removed:
-                print(f"Removed Variants ({len(removed)}):")
-                for gene, vcv in removed:
-                    print(f"  - {gene}: {vcv}")
-                    
+            uid_lists = list(pool.map(search_gene, genes))
+            for gene, uids in zip(genes, uid_lists):
+                if uids is None:
+                    failed.add(gene)
+                    continue
+                for i in range(0, len(uids), batch_size):
+                    futures.append((gene, pool.submit(fetch_batch, gene, uids[i:i+batch_size], i)))
+
+        # Collect in submission order to keep the output deterministic
+        for gene, future in futures:
+            rows = future.result()
+            if rows is None:
+                failed.add(gene)
+                continue
+            for row in rows:
+                yield row
+
+def refresh_gene(gene, since, existing_rows):
+    """
+    Incrementally refresh one gene from its previously fetched rows.
+    Only variants modified since `since` (YYYY/MM/DD) are refetched; variants that are
+    no longer P/LP are dropped. Rows are returned in the order of a full fetch,
+    or None on failure.
+    """
+    term = gene_term(gene)
+    try:
+        current = esearch(term)
+        modified = esearch(term, mindate=since)
     except Exception as e:
-        print(f"Error during comparison: {e}")
-    
-    print("------------------------------------\n")
+        print(f"Failed to search for {gene}: {e}")
+        return None
+
+    current_ids = set(current)
+    modified_ids = set(modified)
+    kept = [row for row in existing_rows
+            if row.variation_id in current_ids and row.variation_id not in modified_ids]
+    withdrawn = {row.variation_id for row in existing_rows} - current_ids
+
+    new_rows = []
+    for i in range(0, len(modified), RETMAX):
+        rows = fetch_id_batch(gene, modified[i:i+RETMAX], i)
+        if rows is None:
+            return None
+        new_rows.extend(rows)
+
+    print(f"  {gene}: {len(modified)} modified, {len(withdrawn)} withdrawn variants since {since}.")
+
+    # Full fetches emit variants in esearch order; keep the same order
+    order = {uid: i for i, uid in enumerate(current)}
+    return sorted(kept + new_rows, key=lambda row: order.get(row.variation_id, len(order)))
+
+def fetch_incremental(genes, existing_rows, sync_state, workers=1, failed=None):
+    """
+    Fetch rows for all genes, refreshing genes with a previous sync incrementally
+    and fetching the others in full. Returns the merged list of rows in gene order.
+    """
+    if failed is None:
+        failed = set()
+    by_gene = {}
+    for row in existing_rows:
+        by_gene.setdefault(row.gene, []).append(row)
+
+    incremental = [g for g in genes if g in sync_state and g in by_gene]
+    full = [g for g in genes if g not in incremental]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        refreshed = dict(zip(incremental, pool.map(
+            lambda g: refresh_gene(g, sync_state[g], by_gene[g]), incremental)))
+
+    fetched = {}
+    for row in fetch_all(full, workers=workers, failed=failed):
+        fetched.setdefault(row.gene, []).append(row)
+
+    rows = []
+    for gene in genes:
+        if gene in refreshed:
+            if refreshed[gene] is None:
+                # Keep the previous rows rather than losing the gene
+                failed.add(gene)
+                rows.extend(by_gene[gene])
+            else:
+                rows.extend(refreshed[gene])
+        else:
+            rows.extend(fetched.get(gene, []))
+    return rows
+
+def load_sync_state(path):
+    """Load the per-gene last successful sync dates."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_sync_state(path, state):
+    """Save the per-gene last successful sync dates."""
+    with open(path, "w") as f:
+        json.dump(state, f, indent=4, sort_keys=True)
 
 def main():
+    parser = argparse.ArgumentParser(description="Fetch P/LP variants from ClinVar.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent requests (default: 1, serial)")
+    parser.add_argument("--api-key", default=API_KEY,
+                        help="NCBI API key (default: $NCBI_API_KEY); raises the rate limit to 10 req/s")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Resolve VCV accessions with esummary instead of paging the History server")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only refetch variants modified since the last successful sync of each gene")
+    parser.add_argument("--release", metavar="FILE",
+                        help="Read variants from a local ClinVar VCV release (ClinVarVCVRelease_*.xml.gz) instead of E-utilities")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="E-utilities base URL (default: $NCBI_EUTILS_URL or the NCBI server)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or store responses in the response cache")
+    parser.add_argument("--offline", action="store_true",
+                        help="Rebuild the results purely from the response cache, without network access")
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL_HOURS,
+                        help=f"Response cache lifetime in hours (default: {CACHE_TTL_HOURS:g})")
+    parser.add_argument("--cache-max-size", type=float, default=CACHE_MAX_SIZE_MB,
+                        help=f"Response cache size limit in MB (default: {CACHE_MAX_SIZE_MB:g})")
+    args = parser.parse_args()
+    
+    cache = None
+    if not args.no_cache or args.offline:
+        cache = ResponseCache(RESPONSE_CACHE_DIR, ttl=args.cache_ttl * 3600,
+                              max_size=int(args.cache_max_size * 1024 * 1024), offline=args.offline)
+    configure(args.api_key, cache, args.base_url)
+
     output_file = "cache/clinvar_results.csv"
     backup_file = "cache/clinvar_results_backup.csv"
+    sync_state_file = "cache/clinvar_sync_state.json"
+    sync_time = datetime.now()
+    sync_state = load_sync_state(sync_state_file)
+    failed = set()
+    
+    existing_rows = []
+    if args.incremental and os.path.exists(output_file):
+        with open(output_file, 'r', newline='', encoding='utf-8') as f:
+            existing_rows = list(read_rows(f))
     
     # Backup existing file if it exists
     if os.path.exists(output_file):
         print(f"Backing up {output_file} to {backup_file}...")
         shutil.copy2(output_file, backup_file)
     
-    fieldnames = [
-        "Gene", "Phenotype", "Classification", "Variant (HGVS)", 
-        "Date Created", "Submitter", "Consequence", "Review Status",
-        "Variation ID", "VCV Accession", "Submission Accession"
-    ]
-    
     print(f"Starting ClinVar extraction for genes: {', '.join(GENES)}")
     
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for gene in GENES:
-            print(f"Processing {gene}...")
-            
-            # Search for Pathogenic/Likely Pathogenic variants
-            term = f"{gene}[Gene Name] AND (pathogenic[Clinical Significance] OR likely pathogenic[Clinical Significance])"
-            
-            try:
-                uids = esearch(term)
-            except Exception as e:
-                print(f"Failed to search for {gene}: {e}")
-                continue
-                
-            print(f"  Found {len(uids)} variants (UIDs).")
-            
-            if not uids:
-                continue
-
-            # Process UIDs in batches to get VCVs
-            # We can do esummary in batches of 100 or more (up to 500 usually safe)
-            # Then efetch in batches of 100
-            
-            batch_size = 100
-            for i in range(0, len(uids), batch_size):
-                batch_uids = uids[i:i+batch_size]
-                try:
-                    # 1. Get VCV Accessions
-                    vcv_ids = esummary_batch(batch_uids)
-                    if not vcv_ids:
-                        continue
-                        
-                    # 2. Fetch XML for VCVs
-                    xml_content = efetch_batch_vcv(vcv_ids)
-                    
-                    # 3. Parse and Write
-                    for row in parse_vcv_xml(xml_content, gene):
-                        writer.writerow(row)
-                        
-                except Exception as e:
-                    print(f"  Error processing batch {i}: {e}")
-                
-                time.sleep(SLEEP_TIME)
+    print(f"Using {args.workers} worker(s), rate limit {rate_limiter.rate:g} req/s")
+    
+    with recorder.stage("fetch", rows_in=len(existing_rows) if args.incremental else None) as stage, \
+            open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        if args.release:
+            from ingest_clinvar_release import ingest_release
+            print(f"Reading release file {args.release}...")
+            rows = ingest_release(args.release, GENES, workers=args.workers)
+        elif args.incremental:
+            rows = fetch_incremental(GENES, existing_rows, sync_state, workers=args.workers, failed=failed)
+        else:
+            rows = fetch_all(GENES, workers=args.workers, use_history=not args.no_history, failed=failed)
+        stage["rows_out"] = write_rows(csvfile, rows)
+        stage["failed_genes"] = sorted(failed)
                 
+    # Normalized tables read by the later stages (see clinvar_tables.py)
+    with recorder.stage("convert"):
+        convert_results(os.path.splitext(output_file)[0])
     print(f"Done. Results saved to {output_file}")
     
+    print("HTTP requests:")
+    client.print_report()
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses.")
+        if not args.offline:
+            cache.evict()
+    
+    # Record the sync date of every gene that was fetched without errors
+    # (a replay from the cache or a release file does not make the data any fresher).
+    # Responses served from the cache are as old as their entry, so the sync date is
+    # that of the oldest one used: changes made since then are refetched next time.
+    if not args.offline and not args.release:
+        if cache is not None and cache.oldest_hit is not None:
+            sync_time = min(sync_time, datetime.fromtimestamp(cache.oldest_hit))
+        sync_date = sync_time.strftime("%Y/%m/%d")
+        for gene in GENES:
+            if gene in failed:
+                sync_state.pop(gene, None)
+            else:
+                sync_state[gene] = sync_date
+        save_sync_state(sync_state_file, sync_state)
+    if failed:
+        print(f"Genes with errors (will be fully refetched next time): {', '.join(sorted(failed))}")
+    
     # Compare with backup
     if os.path.exists(backup_file):
-        compare_results(backup_file, output_file)
+        with recorder.stage("compare"):
+            compare_results(backup_file, output_file, CHANGELOG_BASE)
+    print(f"Metrics saved to {recorder.save('fetch')}")
 
 if __name__ == "__main__":
     main()
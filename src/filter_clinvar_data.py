@@ -1,9 +1,36 @@
 import pandas as pd
+import numpy as np
 import re
 import json
 import os
 import sys
 
+from clinvar_tables import read_results
+from dataset_io import write_dataset
+from genomic_intervals import IntervalIndex
+from keyword_matcher import load_matcher
+from metrics import recorder
+
+# Variant name patterns, compiled once
+CHR_COORDS = re.compile(r'chr\w+:(\d+)-(\d+)')
+CHR_LOCUS = re.compile(r'chr(\w+):(\d+)-(\d+)')
+ASSEMBLY_PREFIX = re.compile(r'^(GRCh3[78]|NCBI36)/')
+REFSEQ_PREFIX = re.compile(r'^NC_0*(\d+)\.(\d+):g\.')
+DIGITS = re.compile(r'\d+')
+# Coordinate parts with exactly two / four integers
+TWO_NUMBERS = re.compile(r'^\D*(\d+)\D+(\d+)\D*$')
+FOUR_NUMBERS = re.compile(r'^\D*(\d+)\D+(\d+)\D+(\d+)\D+(\d+)\D*$')
+# (S1_S2)_(E1_E2) with possibly unknown ("?") bounds
+UNCERTAIN_RANGE = re.compile(r'^\((\d+|\?)_(\d+|\?)\)_\((\d+|\?)_(\d+|\?)\)')
+
+# RefSeq chromosome accession versions of GRCh38; GRCh37 versions are one lower
+GRCH38_REFSEQ_VERSIONS = {
+    1: 11, 2: 12, 3: 12, 4: 12, 5: 10, 6: 12, 7: 14, 8: 11, 9: 12, 10: 11, 11: 10, 12: 12,
+    13: 11, 14: 9, 15: 10, 16: 10, 17: 11, 18: 10, 19: 10, 20: 11, 21: 9, 22: 11, 23: 11, 24: 10
+}
+
+ACCEPTED_YEARS = [2022, 2023, 2024, 2025]
+
 def parse_variant_size(variant_name):
     """
     Parses variant name to estimate size (for CNVs).
@@ -12,7 +39,7 @@ def parse_variant_size(variant_name):
     variant_name = str(variant_name)
     
     # 1. Handle "chrX:Start-End" format (e.g. GRCh37/hg19 12q24(chr12:123-456))
-    match_chr = re.search(r'chr\w+:(\d+)-(\d+)', variant_name)
+    match_chr = CHR_COORDS.search(variant_name)
     if match_chr:
         start, end = map(int, match_chr.groups())
         return abs(end - start)
@@ -29,7 +56,7 @@ def parse_variant_size(variant_name):
         # (?_123)_(456_?)del
         
         # Filter out '?' and just take digits
-        numbers = [int(x) for x in re.findall(r'\d+', coords_part)]
+        numbers = [int(x) for x in DIGITS.findall(coords_part)]
         
         if len(numbers) >= 2:
             # If 2 numbers: A_B -> Size = B - A
@@ -50,12 +77,198 @@ def parse_variant_size(variant_name):
             
             # If 3 numbers: e.g. (A_B)_(C_?) -> Min Size = C - B
             # Or (?_A)_(B_C) -> Min Size = B - A
-            # This is getting complex. Let's stick to the 2 and 4 cases which cover most "defined" CNVs.
-            # For 3 numbers, it's ambiguous which bound is missing.
-            pass
+            # The position of "?" tells which bound is missing; the inner bounds give the size.
+            if len(numbers) == 3:
+                match = UNCERTAIN_RANGE.match(coords_part)
+                if match and match.group(2) != '?' and match.group(3) != '?':
+                    inner_start, inner_end = int(match.group(2)), int(match.group(3))
+                    return inner_end - inner_start if inner_start < inner_end else 0
 
     return 0
 
+def as_text(series):
+    """Column as strings, with missing values rendered as str() would ("nan")."""
+    return series.fillna("nan").astype(str)
+
+def variant_sizes(names):
+    """
+    Vectorized parse_variant_size over a Series of variant names.
+    Returns an int64 array of sizes in bp (0 if not applicable/parsable).
+    """
+    names = as_text(names)
+    
+    # 1. "chrX:Start-End" format
+    chr_coords = names.str.extract(CHR_COORDS).astype(float)
+    chr_size = (chr_coords[1] - chr_coords[0]).abs()
+    
+    # 2. "g." coordinates: the part between the first and second "g."
+    coords_part = names.str.split("g.", n=2, regex=False).str[1].fillna("")
+    two = coords_part.str.extract(TWO_NUMBERS).astype(float)
+    four = coords_part.str.extract(FOUR_NUMBERS).astype(float)
+    two_size = (two[1] - two[0]).abs()
+    # (A_B)_(C_D) -> Min Size = C - B, 0 if the inner bounds overlap
+    four_size = np.where(four[1] < four[2], four[2] - four[1], 0)
+    four_size = pd.Series(four_size, index=names.index).where(four[0].notna())
+    
+    # (A_B)_(C_?) / (?_A)_(B_C) -> Min Size from the known inner bounds
+    uncertain = coords_part.str.extract(UNCERTAIN_RANGE).apply(pd.to_numeric, errors="coerce")
+    three = coords_part.str.count(DIGITS) == 3
+    three_size = (uncertain[2] - uncertain[1]).clip(lower=0).where(three)
+    
+    size = chr_size.fillna(two_size).fillna(four_size).fillna(three_size).fillna(0)
+    return size.to_numpy(dtype=np.int64)
+
+def refseq_chromosome(number):
+    """Chromosome name of an NC_0000NN accession number."""
+    number = int(number)
+    return {23: "X", 24: "Y"}.get(number, str(number))
+
+def variant_coordinates(names):
+    """
+    Structured genomic coordinates parsed from variant names ("chrN:start-end"
+    ISCN-style names and NC_ RefSeq "g." HGVS names).
+    Returns a DataFrame with Assembly, Chromosome, Start, End (the certainly
+    affected, inner interval), Min Size and Max Size (None/<NA> where unknown).
+    """
+    names = as_text(names)
+    
+    # "GRCh37/hg19 12q24(chr12:123-456)x3"
+    locus = names.str.extract(CHR_LOCUS)
+    locus_start = pd.to_numeric(locus[1])
+    locus_end = pd.to_numeric(locus[2])
+    locus_size = (locus_end - locus_start).abs()
+    locus_assembly = names.str.extract(ASSEMBLY_PREFIX)[0]
+    
+    # "NC_000012.11:g.(A_B)_(C_D)del", "NC_000022.11:g.A_Bdel"
+    refseq = names.str.extract(REFSEQ_PREFIX).apply(pd.to_numeric)
+    refseq_chrom = refseq[0].map(refseq_chromosome, na_action="ignore")
+    grch38_version = refseq[0].map(GRCH38_REFSEQ_VERSIONS)
+    refseq_assembly = pd.Series(np.select(
+        [refseq[1] == grch38_version, refseq[1] == grch38_version - 1], ["GRCh38", "GRCh37"], default=None),
+        index=names.index)
+    
+    coords_part = names.str.split("g.", n=2, regex=False).str[1].fillna("")
+    two = coords_part.str.extract(TWO_NUMBERS).apply(pd.to_numeric)
+    uncertain = coords_part.str.extract(UNCERTAIN_RANGE).apply(pd.to_numeric, errors="coerce")
+    # Uncertain ranges use their inner bounds; the outer ones only give the max size
+    is_range = coords_part.str.match(UNCERTAIN_RANGE)
+    two_size = (two[1] - two[0]).abs()
+    g_start = uncertain[1].where(is_range, two[0])
+    g_end = uncertain[2].where(is_range, two[1])
+    g_min = (uncertain[2] - uncertain[1]).clip(lower=0).where(is_range, two_size)
+    g_max = (uncertain[3] - uncertain[0]).where(is_range, two_size)
+    
+    has_locus = locus_start.notna()
+    start = locus_start.where(has_locus, g_start)
+    end = locus_end.where(has_locus, g_end)
+    # With an unknown inner bound ("(A_?)_(C_D)") no position is certainly affected
+    known = start.notna() & end.notna()
+    
+    coords = pd.DataFrame(index=names.index)
+    coords['Assembly'] = locus_assembly.where(has_locus, refseq_assembly)
+    coords['Chromosome'] = locus[0].where(has_locus, refseq_chrom)
+    coords['Start'] = np.fmin(start, end).where(known).astype("Int64")
+    coords['End'] = np.fmax(start, end).where(known).astype("Int64")
+    coords['Min Size'] = locus_size.where(has_locus, g_min).astype("Int64")
+    coords['Max Size'] = locus_size.where(has_locus, g_max).astype("Int64")
+    return coords
+
+def recurrent_regions(coords, region_index):
+    """Names of configured recurrent regions overlapped by each variant (None if none)."""
+    def values(column):
+        return coords[column].astype(object).where(coords[column].notna(), None)
+    return pd.Series(region_index.annotate(values('Assembly'), values('Chromosome'),
+                                           values('Start'), values('End')),
+                     index=coords.index, dtype=object)
+
+def filter_frame(df, size_limit, exclude_keywords, normalize_keywords=False, matcher=None, regions=None,
+                 years=ACCEPTED_YEARS):
+    """
+    Apply the date (submission year in `years`), size, recurrent region and syndrome
+    filters to a results DataFrame.
+    Returns (kept, rejected) DataFrames with added 'Estimated Size', coordinate
+    (see variant_coordinates) and 'Recurrent Region' columns; rejected rows also
+    carry a 'Rejection Reason'.
+    Keywords are matched with a KeywordMatcher (built from exclude_keywords unless
+    a prebuilt one is passed). Regions are dicts with name, assembly, chromosome,
+    start, end and action ("tag" or "exclude").
+    """
+    regions = regions or []
+    df = df.copy()
+    df['Date Created'] = pd.to_datetime(df['Date Created'])
+    df['Estimated Size'] = variant_sizes(df['Variant (HGVS)'])
+    coords = variant_coordinates(df['Variant (HGVS)'])
+    df[coords.columns] = coords
+    df['Recurrent Region'] = recurrent_regions(coords, IntervalIndex(regions))
+    
+    reason = pd.Series(None, index=df.index, dtype=object)
+    
+    # 0. Filter by Date (2022-2025 unless configured otherwise)
+    created = df['Date Created'].dt.year
+    out_of_range = ~created.isin(years)
+    year_text = created.fillna(0).astype(np.int64).astype(str).where(created.notna(), "nan")
+    reason[out_of_range] = "Date out of range: " + year_text[out_of_range]
+    
+    # 1. Filter by Size (CNVs > Limit)
+    too_large = reason.isna() & (df['Estimated Size'] > size_limit)
+    reason[too_large] = "Large Genomic Event (>500kb): " + df.loc[too_large, 'Estimated Size'].astype(str) + " bp"
+    
+    # 1b. Filter by overlap with recurrent syndrome regions marked for exclusion
+    excluded_regions = [r for r in regions if r.get("action") == "exclude"]
+    if excluded_regions:
+        excluded = recurrent_regions(coords, IntervalIndex(excluded_regions))
+        in_region = reason.isna() & excluded.notna()
+        reason[in_region] = "Recurrent Region: " + excluded[in_region]
+    
+    # 2. Filter by Phenotype Keywords (Syndromes), first listed keyword wins.
+    # Each distinct phenotype is scanned once by the automaton.
+    if matcher is None:
+        matcher = load_matcher(exclude_keywords, normalize_keywords)
+    phenotype = as_text(df['Phenotype'])
+    pending = reason.isna()
+    hits = {text: matcher.first_match(text) for text in phenotype[pending].unique()}
+    # As str, since the mapped Series is float when no row is pending
+    keyword = phenotype[pending].map(hits).dropna().astype(str)
+    reason[keyword.index] = "Syndrome Phenotype: " + keyword
+    
+    rejected_mask = reason.notna()
+    df_filtered = df[~rejected_mask].reset_index(drop=True)
+    df_rejected = df[rejected_mask].copy()
+    df_rejected['Rejection Reason'] = reason[rejected_mask]
+    return df_filtered, df_rejected.reset_index(drop=True)
+
+def load_config(config_path):
+    """Filtering parameters from config/filtering.json, with defaults for missing keys."""
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    return {
+        "size_limit": config.get("size_limit", 500000),
+        "exclude_keywords": config.get("exclude_keywords", []),
+        "normalize_keywords": config.get("normalize_keywords", False),
+        "recurrent_regions": config.get("recurrent_regions", []),
+        "years": config.get("years", ACCEPTED_YEARS),
+    }
+
+def filter_variants(df, config, matcher_cache=None):
+    """
+    Filter a results DataFrame with a config as returned by load_config.
+    The keyword automaton is pickled at matcher_cache and rebuilt only when the
+    keyword list changes. Returns (kept, rejected) DataFrames.
+    """
+    matcher = load_matcher(config["exclude_keywords"], config["normalize_keywords"], matcher_cache)
+    return filter_frame(df, config["size_limit"], config["exclude_keywords"], matcher=matcher,
+                        regions=config["recurrent_regions"], years=config.get("years", ACCEPTED_YEARS))
+
+def print_summary(df_filtered, df_rejected):
+    """Print the kept/rejected counts and the keyword and region hits."""
+    print(f"Kept: {len(df_filtered)}, Rejected: {len(df_rejected)}")
+    syndrome_hits = df_rejected['Rejection Reason'].str.extract(r'^Syndrome Phenotype: (.*)$')[0].value_counts()
+    for keyword, count in syndrome_hits.items():
+        print(f"  Syndrome keyword '{keyword}': {count}")
+    tagged = pd.concat([df_filtered, df_rejected])['Recurrent Region'].value_counts()
+    for region, count in tagged.items():
+        print(f"  In recurrent region {region}: {count}")
+
 def filter_data():
     print("Filtering data...")
     
@@ -63,75 +276,36 @@ def filter_data():
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     config_path = os.path.join(base_dir, "config", "filtering.json")
     cache_dir = os.path.join(base_dir, "cache")
-    input_csv = os.path.join(cache_dir, "clinvar_results.csv")
-    output_csv = os.path.join(cache_dir, "clinvar_filtered_2022_2025_final.csv")
-    rejected_csv = os.path.join(cache_dir, "rejected_variants.csv")
+    # Datasets are stored as <name>.parquet plus a <name>.csv export (see dataset_io);
+    # the fetched results as normalized tables in <name>/ (see clinvar_tables)
+    input_path = os.path.join(cache_dir, "clinvar_results")
+    output_path = os.path.join(cache_dir, "clinvar_filtered_2022_2025_final")
+    rejected_path = os.path.join(cache_dir, "rejected_variants")
     
     # Load Config
-    with open(config_path, "r") as f:
-        config = json.load(f)
-        
-    SIZE_LIMIT = config.get("size_limit", 500000)
-    EXCLUDE_KEYWORDS = config.get("exclude_keywords", [])
+    config = load_config(config_path)
     
-    if not os.path.exists(input_csv):
-        print(f"Error: Input file {input_csv} not found.")
+    if not os.path.exists(input_path + ".csv") and not os.path.isdir(input_path):
+        print(f"Error: Input file {input_path}.csv not found.")
         return
 
-    df = pd.read_csv(input_csv)
-    
-    # Convert Submission Date to datetime
-    df['Date Created'] = pd.to_datetime(df['Date Created'])
-    
-    filtered_rows = []
-    rejected_rows = []
-    
-    for _, row in df.iterrows():
-        # Convert row to dict to make it mutable and preserve all columns
-        row_dict = row.to_dict()
-        
-        name = str(row_dict.get('Variant (HGVS)', ''))
-        phenotype = str(row_dict.get('Phenotype', ''))
-        sub_date = row_dict.get('Date Created')
-        
-        reason = None
-        size = parse_variant_size(name)
-        
-        # Add Estimated Size to the row
-        row_dict['Estimated Size'] = size
-        
-        # 0. Filter by Date (2022-2025)
-        if hasattr(sub_date, 'year') and sub_date.year not in [2022, 2023, 2024, 2025]:
-            reason = f"Date out of range: {sub_date.year}"
-        
-        # 1. Filter by Size (CNVs > Limit)
-        if not reason and size > SIZE_LIMIT:
-            reason = f"Large Genomic Event (>500kb): {size} bp"
-            
-        # 2. Filter by Phenotype Keywords (Syndromes)
-        if not reason:
-            for keyword in EXCLUDE_KEYWORDS:
-                if keyword in phenotype:
-                    reason = f"Syndrome Phenotype: {keyword}"
-                    break
-            
-        if reason:
-            row_dict['Rejection Reason'] = reason
-            rejected_rows.append(row_dict)
-        else:
-            filtered_rows.append(row_dict)
-        
-    df_filtered = pd.DataFrame(filtered_rows)
-    df_rejected = pd.DataFrame(rejected_rows)
+    with recorder.stage("load") as stage:
+        df = read_results(input_path)
+        stage["rows_out"] = len(df)
     
-    # Ensure columns are in a nice order if possible, but keeping all is key
-    # We just write what we have.
+    with recorder.stage("filter", rows_in=len(df)) as stage:
+        df_filtered, df_rejected = filter_variants(df, config, os.path.join(cache_dir, "keyword_matcher.pkl"))
+        stage["rows_out"] = len(df_filtered)
+        stage["rows_rejected"] = len(df_rejected)
     
-    df_filtered.to_csv(output_csv, index=False)
-    df_rejected.to_csv(rejected_csv, index=False)
+    with recorder.stage("write", rows_in=len(df_filtered) + len(df_rejected)):
+        write_dataset(df_filtered, output_path)
+        write_dataset(df_rejected, rejected_path)
     
-    print(f"Filtered data saved. Kept: {len(df_filtered)}, Rejected: {len(df_rejected)}")
-    print(f"Output saved to: {output_csv}")
+    print("Filtered data saved.", end=" ")
+    print_summary(df_filtered, df_rejected)
+    print(f"Output saved to: {output_path}.csv")
+    print(f"Metrics saved to {recorder.save('filter')}")
 
 if __name__ == "__main__":
     filter_data()
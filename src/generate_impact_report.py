@@ -1,51 +1,150 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import hashlib
+import json
 import os
-from datetime import datetime
-
-# Ensure output directory exists
-output_dir = "cache/"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-# Load Data
-df = pd.read_csv("cache/clinvar_filtered_2022_2025_final.csv")
-
-# Filter for 2022-2025
-def parse_date(date_str):
-    try:
-        return pd.to_datetime(date_str)
-    except:
-        return pd.NaT
-
-df['Date Created'] = df['Date Created'].apply(parse_date)
-df = df.dropna(subset=['Date Created'])
-df = df[df['Date Created'].dt.year.isin([2022, 2023, 2024, 2025])]
-
-print(f"Filtered data (2022-2025): {len(df)} records")
-
-# 1. Diagnoses over Time (Yearly) - Polish
-yearly_counts = df['Date Created'].dt.year.value_counts().sort_index()
-plt.figure(figsize=(10, 6))
-yearly_counts.plot(kind='bar', color='#4C72B0')
-plt.title('Liczba zgłoszeń wariantów sklasyfikowanych jako Pathogenic lub Likely Pathogenic w latach 2022-2025')
-plt.xlabel('Rok')
-plt.ylabel('Liczba zgłoszeń')
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-plt.savefig('cache/impact_timeline_pl.png')
-plt.close()
-
-# 2. Diagnoses by Gene - Polish
-gene_counts = df['Gene'].value_counts()
-plt.figure(figsize=(12, 6))
-gene_counts.plot(kind='bar', color='#55A868')
-plt.title('Liczba zgłoszeń wariantów sklasyfikowanych jako Pathogenic lub Likely Pathogenic wg genu (2022-2025)')
-plt.xlabel('Gen')
-plt.ylabel('Liczba zgłoszeń')
-plt.xticks(rotation=45)
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-plt.tight_layout()
-plt.savefig('cache/impact_by_gene_pl.png')
-plt.close()
-
-print("Polish visualizations generated in cache/")
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # Charts are only saved to files, no display needed
+import pandas as pd
+from matplotlib.figure import Figure
+
+from dataset_io import read_dataset
+from metrics import recorder
+
+REPORT_YEARS = [2022, 2023, 2024, 2025]
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CENTERS_CONFIG = os.path.join(BASE_DIR, "config", "config_centers.json")
+# Aggregate hashes of the last render, kept next to the charts
+STATE_FILE = "charts_state.json"
+UNKNOWN_COUNTRY = "Nieznany"
+MAX_CONSEQUENCES = 15
+
+# Columns of the filtered dataset used by the charts
+CHART_COLUMNS = ['Gene', 'Date Created', 'Submitter', 'Classification', 'Consequence']
+TITLE = 'Liczba zgłoszeń wariantów sklasyfikowanych jako Pathogenic lub Likely Pathogenic'
+
+def yearly_counts(df, center_map):
+    return df['Date Created'].dt.year.value_counts().sort_index()
+
+def gene_counts(df, center_map):
+    return df['Gene'].value_counts()
+
+def country_counts(df, center_map):
+    return df['Submitter'].astype(str).map(center_map).fillna(UNKNOWN_COUNTRY).value_counts()
+
+def classification_counts(df, center_map):
+    # ClinVar is not consistent about the case ("Likely pathogenic" / "Likely Pathogenic")
+    return df['Classification'].astype(str).str.capitalize().value_counts()
+
+def consequence_counts(df, center_map):
+    return df['Consequence'].dropna().astype(str).value_counts().head(MAX_CONSEQUENCES)
+
+# One bar chart per entry, drawn from the (label -> count) table returned by "aggregate".
+# "{period}" in the title is replaced by the report years.
+CHARTS = [
+    {"file": "impact_timeline_pl.png", "aggregate": yearly_counts, "figsize": (10, 6), "color": '#4C72B0',
+     "title": TITLE + ' w latach {period}', "xlabel": 'Rok'},
+    {"file": "impact_by_gene_pl.png", "aggregate": gene_counts, "figsize": (12, 6), "color": '#55A868',
+     "title": TITLE + ' wg genu ({period})', "xlabel": 'Gen', "rotation": 45, "tight": True},
+    {"file": "impact_by_country_pl.png", "aggregate": country_counts, "figsize": (12, 6), "color": '#C44E52',
+     "title": TITLE + ' wg kraju ośrodka ({period})', "xlabel": 'Kraj', "rotation": 45, "tight": True},
+    {"file": "impact_by_classification_pl.png", "aggregate": classification_counts, "figsize": (10, 6),
+     "color": '#8172B2', "title": TITLE + ' wg klasyfikacji ({period})', "xlabel": 'Klasyfikacja',
+     "rotation": 0, "tight": True},
+    {"file": "impact_by_consequence_pl.png", "aggregate": consequence_counts, "figsize": (12, 6),
+     "color": '#CCB974', "title": TITLE + ' wg skutku wariantu ({period})', "xlabel": 'Skutek wariantu',
+     "rotation": 45, "tight": True},
+]
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def draw_chart(chart, labels, counts, period, path):
+    """Draw one bar chart of the aggregate table (labels, counts) and save it to path."""
+    fig = Figure(figsize=chart["figsize"])
+    ax = fig.add_subplot()
+    pd.Series(counts, index=labels).plot(kind='bar', color=chart["color"], ax=ax)
+    ax.set_title(chart["title"].format(period=period))
+    ax.set_xlabel(chart["xlabel"])
+    ax.set_ylabel('Liczba zgłoszeń')
+    if "rotation" in chart:
+        ax.tick_params(axis='x', labelrotation=chart["rotation"])
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    if chart.get("tight"):
+        fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+def render_charts(df, output_dir="cache/", years=REPORT_YEARS, center_map=None, workers=None, force=False):
+    """
+    Draw the report charts of the variants submitted in `years` from the filtered
+    variants DataFrame into output_dir. Each chart is drawn from a small aggregate
+    table and only when that table (or this module) changed since the last render,
+    unless force; charts to redraw are drawn in parallel processes (at most
+    `workers`). Returns the paths of all the charts.
+    """
+    # Ensure output directory exists
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    if center_map is None:
+        with open(CENTERS_CONFIG, "r") as f:
+            center_map = json.load(f)
+
+    # Filter for the report years ('Date Created' is already a datetime column)
+    df = df.dropna(subset=['Date Created'])
+    df = df[df['Date Created'].dt.year.isin(years)]
+    period = f"{min(years)}-{max(years)}"
+
+    print(f"Filtered data ({period}): {len(df)} records")
+
+    state_path = os.path.join(output_dir, STATE_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    source = file_hash(os.path.abspath(__file__))
+
+    paths, todo = [], []
+    for chart in CHARTS:
+        counts = chart["aggregate"](df, center_map)
+        counts = counts[counts > 0]
+        labels, values = [str(label) for label in counts.index], [int(count) for count in counts]
+        payload = json.dumps([source, chart["file"], period, labels, values], ensure_ascii=False)
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        path = os.path.join(output_dir, chart["file"])
+        paths.append(path)
+        saved = state.get(chart["file"], {})
+        if force or saved.get("key") != key or saved.get("sha256") != file_hash(path):
+            todo.append((chart, labels, values, key, path))
+
+    if len(todo) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=min(len(todo), workers or os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(draw_chart, chart, labels, values, period, path)
+                       for chart, labels, values, _, path in todo]
+            for future in futures:
+                future.result()
+    else:
+        for chart, labels, values, _, path in todo:
+            draw_chart(chart, labels, values, period, path)
+
+    for chart, _, _, key, path in todo:
+        state[chart["file"]] = {"key": key, "sha256": file_hash(path)}
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, state_path)
+
+    print(f"Polish visualizations generated in {output_dir} ({len(todo)} drawn, {len(CHARTS) - len(todo)} unchanged)")
+    return paths
+
+if __name__ == "__main__":
+    # Load Data
+    with recorder.stage("load") as stage:
+        df = read_dataset("cache/clinvar_filtered_2022_2025_final", columns=CHART_COLUMNS)
+        stage["rows_out"] = len(df)
+    with recorder.stage("charts", rows_in=len(df)):
+        render_charts(df, "cache/")
+    print(f"Metrics saved to {recorder.save('charts')}")
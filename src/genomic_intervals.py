@@ -0,0 +1,49 @@
+import numpy as np
+
+class IntervalIndex:
+    """
+    Sorted-array index of genomic regions for overlap queries.
+    Regions are grouped by (assembly, chromosome) and sorted by start; a running
+    maximum of region ends bounds the candidates, so a query costs two binary
+    searches plus the number of overlapping regions.
+    """
+
+    def __init__(self, regions):
+        self.regions = list(regions)
+        groups = {}
+        for region in self.regions:
+            key = (region["assembly"], str(region["chromosome"]))
+            groups.setdefault(key, []).append(region)
+
+        self.index = {}
+        for key, members in groups.items():
+            members.sort(key=lambda r: r["start"])
+            starts = np.array([r["start"] for r in members], dtype=np.int64)
+            ends = np.array([r["end"] for r in members], dtype=np.int64)
+            self.index[key] = (starts, ends, np.maximum.accumulate(ends), members)
+
+    def overlapping(self, assembly, chromosome, start, end):
+        """Regions overlapping [start, end] (inclusive) on the given assembly and chromosome."""
+        entry = self.index.get((assembly, str(chromosome)))
+        if entry is None:
+            return []
+        starts, ends, max_ends, members = entry
+        # Regions starting after the query end cannot overlap
+        stop = np.searchsorted(starts, end, side="right")
+        # Regions before the first whose running max end reaches the query start cannot either
+        first = np.searchsorted(max_ends, start, side="left")
+        return [members[i] for i in range(first, stop) if ends[i] >= start]
+
+    def annotate(self, assemblies, chromosomes, starts, ends):
+        """
+        Names of overlapping regions for each variant, joined with "; " (None if none
+        or if the variant has no coordinates).
+        """
+        names = []
+        for assembly, chromosome, start, end in zip(assemblies, chromosomes, starts, ends):
+            if assembly is None or chromosome is None or start is None or end is None:
+                names.append(None)
+                continue
+            hits = self.overlapping(assembly, chromosome, start, end)
+            names.append("; ".join(region["name"] for region in hits) if hits else None)
+        return names
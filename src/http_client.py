@@ -0,0 +1,194 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (10, 60)  # (connect, read) seconds
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # Seconds, doubled on every retry
+BACKOFF_MAX = 30
+RETRY_STATUS = {429, 500, 502, 503, 504}
+POOL_SIZE = 16
+
+class RateLimiter:
+    """Token bucket shared by all threads of the process."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class EndpointStats:
+    """Request counters and latencies of one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies = []
+
+    def mark(self):
+        """Counter values to pass as `since` to to_dict later."""
+        return (self.requests, self.retries, self.errors, self.bytes, len(self.latencies))
+
+    def to_dict(self, since=None):
+        """Statistics as a dict; with `since` (a mark()) only of the requests after it."""
+        requests, retries, errors, size, first = since or (0, 0, 0, 0, 0)
+        latencies = self.latencies[first:]
+        return {
+            "requests": self.requests - requests,
+            "retries": self.retries - retries,
+            "errors": self.errors - errors,
+            "bytes": self.bytes - size,
+            "latency_p50": round(percentile(latencies, 50), 4),
+            "latency_p95": round(percentile(latencies, 95), 4),
+            "latency_max": round(max(latencies, default=0.0), 4),
+            "latency_total": round(sum(latencies), 4),
+        }
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+def retry_after(response):
+    """Seconds to wait according to a Retry-After header, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HttpClient:
+    """
+    Pooled keep-alive HTTP transport shared by the fetch stages.
+    Retries connection errors, timeouts, 429 and 5xx responses with exponential
+    backoff and jitter, honouring Retry-After, and records per-endpoint statistics.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, timeout=DEFAULT_TIMEOUT, pool_size=POOL_SIZE):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def endpoint_stats(self, endpoint):
+        with self.lock:
+            if endpoint not in self.stats:
+                self.stats[endpoint] = EndpointStats()
+            return self.stats[endpoint]
+
+    def backoff(self, attempt, response=None):
+        """Delay before retry number `attempt` (1-based)."""
+        if response is not None:
+            delay = retry_after(response)
+            if delay is not None:
+                return min(delay, BACKOFF_MAX)
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def request(self, method, url, endpoint=None, limiter=None, timeout=None, stream=False, **kwargs):
+        """
+        Send a request and return the response, raising requests.HTTPError for
+        error statuses once retries are exhausted. `limiter` (a RateLimiter) is
+        acquired before every attempt.
+        """
+        stats = self.endpoint_stats(endpoint or url)
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            start = time.monotonic()
+            response = None
+            try:
+                response = self.session.request(method, url, timeout=timeout, stream=stream, **kwargs)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            elapsed = time.monotonic() - start
+
+            with self.lock:
+                stats.requests += 1
+                stats.latencies.append(elapsed)
+                if response is not None:
+                    if stream:
+                        stats.bytes += int(response.headers.get("Content-Length", 0))
+                    else:
+                        stats.bytes += len(response.content)
+
+            retryable = error is not None or response.status_code in RETRY_STATUS
+            if not retryable or attempt >= self.max_retries:
+                if error is not None or response.status_code >= 400:
+                    with self.lock:
+                        stats.errors += 1
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+                return response
+
+            attempt += 1
+            with self.lock:
+                stats.retries += 1
+            delay = self.backoff(attempt, response)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def mark(self):
+        """Current counters of all endpoints, to pass as `since` to report later."""
+        with self.lock:
+            return {endpoint: stats.mark() for endpoint, stats in self.stats.items()}
+
+    def report(self, since=None):
+        """Per-endpoint statistics as a dict; with `since` (a mark()) only of later requests."""
+        since = since or {}
+        with self.lock:
+            report = {endpoint: stats.to_dict(since.get(endpoint))
+                      for endpoint, stats in sorted(self.stats.items())}
+        return {endpoint: stats for endpoint, stats in report.items() if stats["requests"]}
+
+    def print_report(self):
+        for endpoint, stats in self.report().items():
+            print(f"  {endpoint}: {stats['requests']} requests, {stats['retries']} retries, "
+                  f"{stats['errors']} errors, p50 {stats['latency_p50']:.3f}s, p95 {stats['latency_p95']:.3f}s")
+
+# Shared by all modules of the process
+client = HttpClient()
@@ -0,0 +1,119 @@
+import csv
+import gzip
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+
+from fetch_clinvar_data import parse_archive, read_rows
+
+ARCHIVE_START = b"<VariationArchive "
+ARCHIVE_END = b"</VariationArchive>"
+BLOCK_SIZE = 1 << 20  # Bytes of decompressed XML read at a time
+WINDOW_PER_WORKER = 64  # Archives in flight per worker process
+
+def iter_archive_chunks(path, block_size=BLOCK_SIZE):
+    """
+    Stream a ClinVar VCV release file (ClinVarVCVRelease_*.xml.gz or plain XML)
+    and yield the raw bytes of each top-level VariationArchive element.
+    Only the current block and one partial archive are held in memory.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    buffer = b""
+    with opener(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            buffer += block
+            pos = 0
+            while True:
+                begin = buffer.find(ARCHIVE_START, pos)
+                if begin < 0:
+                    # Keep a tail in case the start tag is split across blocks
+                    pos = max(pos, len(buffer) - len(ARCHIVE_START))
+                    break
+                end = buffer.find(ARCHIVE_END, begin)
+                if end < 0:
+                    pos = begin
+                    break
+                end += len(ARCHIVE_END)
+                yield buffer[begin:end]
+                pos = end
+            buffer = buffer[pos:]
+
+def gene_prefilter(genes):
+    """Compiled byte pattern matching any of the genes as a Gene Symbol attribute."""
+    alternatives = b"|".join(re.escape(g.encode("utf-8")) for g in genes)
+    return re.compile(b'Symbol="(?:' + alternatives + b')"')
+
+def archive_genes(archive):
+    """Gene symbols listed for the variant of a VariationArchive element."""
+    return [gene.get("Symbol") for gene in archive.iterfind("ClassifiedRecord/SimpleAllele/GeneList/Gene")]
+
+def parse_chunk(chunk, genes):
+    """Parse one VariationArchive chunk. Returns rows for each configured gene it belongs to."""
+    archive = ET.fromstring(chunk)
+    rows = []
+    for gene in archive_genes(archive):
+        if gene in genes:
+            rows.extend(parse_archive(archive, gene))
+    return rows
+
+_worker_genes = None
+
+def _init_worker(genes):
+    global _worker_genes
+    _worker_genes = genes
+
+def _parse_chunk_worker(chunk):
+    return parse_chunk(chunk, _worker_genes)
+
+def iter_release_rows(path, genes, workers=1):
+    """
+    Yield rows (as produced by parse_vcv_xml) for the given genes from a local ClinVar
+    VCV release file, in one pass. Archives that cannot mention any of the genes are
+    skipped before XML parsing; with workers > 1 parsing runs in worker processes.
+    Rows are yielded in release order.
+    """
+    genes = frozenset(genes)
+    prefilter = gene_prefilter(genes)
+    chunks = (chunk for chunk in iter_archive_chunks(path) if prefilter.search(chunk))
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from parse_chunk(chunk, genes)
+        return
+
+    # Bounded windows instead of Pool.imap, which would read the whole input ahead
+    window_size = workers * WINDOW_PER_WORKER
+    with Pool(workers, initializer=_init_worker, initargs=(genes,)) as pool:
+        window = []
+        for chunk in chunks:
+            window.append(chunk)
+            if len(window) >= window_size:
+                for rows in pool.map(_parse_chunk_worker, window, chunksize=WINDOW_PER_WORKER // 4):
+                    yield from rows
+                window = []
+        for rows in pool.map(_parse_chunk_worker, window):
+            yield from rows
+
+def ingest_release(path, genes, workers=1):
+    """
+    Yield rows for the given genes from a release file, grouped by gene in the order
+    of `genes` (as the E-utilities fetch does). Rows are spooled to per-gene temporary
+    files, so memory stays constant for any release size.
+    """
+    spools = {gene: tempfile.TemporaryFile("w+", newline="", encoding="utf-8") for gene in genes}
+    try:
+        spool_writers = {gene: csv.writer(f) for gene, f in spools.items()}
+        for row in iter_release_rows(path, genes, workers):
+            spool_writers[row.gene].writerow(row)
+
+        for gene in genes:
+            spool = spools[gene]
+            spool.seek(0)
+            yield from read_rows(spool, header=False)
+    finally:
+        for f in spools.values():
+            f.close()
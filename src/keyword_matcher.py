@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import deque
+
+def normalize_text(text):
+    """Case-insensitive, whitespace-collapsed form used by the normalized mode."""
+    return " ".join(text.casefold().split())
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a list of keywords. Finds, in one pass over a text,
+    the keyword that comes first in the list among all keywords occurring in it,
+    i.e. the same answer as `next(k for k in keywords if k in text)`.
+    With normalize=True keywords and texts are compared case-insensitively with
+    whitespace runs collapsed.
+    """
+
+    def __init__(self, keywords, normalize=False):
+        self.keywords = list(keywords)
+        self.normalize = normalize
+        # Per state: transitions, failure link, lowest keyword index ending here
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in self.prepare(keyword):
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                state = next_state
+            if self.best[state] is None:
+                self.best[state] = index
+
+        # Breadth-first failure links; a state also reports the keywords of its
+        # failure state (proper suffixes of the state's string)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.best[next_state] = _min_index(self.best[next_state], self.best[self.fail[next_state]])
+
+    def prepare(self, text):
+        return normalize_text(text) if self.normalize else text
+
+    def first_index(self, text):
+        """Index of the first listed keyword occurring in text, or None."""
+        goto, fail, best = self.goto, self.fail, self.best
+        found = best[0]  # An empty keyword matches everything
+        state = 0
+        for char in self.prepare(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] is not None and (found is None or best[state] < found):
+                found = best[state]
+                if found == 0:
+                    break
+        return found
+
+    def first_match(self, text):
+        """The first listed keyword occurring in text, or None."""
+        index = self.first_index(text)
+        return None if index is None else self.keywords[index]
+
+def _min_index(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+def load_matcher(keywords, normalize=False, cache_path=None):
+    """
+    Build a KeywordMatcher, reusing the automaton pickled at cache_path when it was
+    built from the same keywords and mode.
+    """
+    digest = hashlib.sha256(json.dumps([list(keywords), normalize]).encode("utf-8")).hexdigest()
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached_digest, matcher = pickle.load(f)
+            if cached_digest == digest:
+                return matcher
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            pass
+
+    matcher = KeywordMatcher(keywords, normalize)
+    if cache_path:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((digest, matcher), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return matcher
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import os
+import re
+
+# Placeholders are <<name>>, which never occurs in the LaTeX of the report
+FIELD_PATTERN = re.compile(r'<<(\w+)>>')
+
+class Template:
+    """LaTeX text with <<field>> placeholders, split into literal parts once."""
+
+    def __init__(self, text):
+        self.parts = FIELD_PATTERN.split(text)
+        self.fields = sorted(set(self.parts[1::2]))
+
+    def render(self, values):
+        parts = list(self.parts)
+        parts[1::2] = [str(values[field]) for field in self.parts[1::2]]
+        return "".join(parts)
+
+def source_hash(*paths):
+    """Hash of this module and the given source files, so that code changes invalidate the cached fragments."""
+    digest = hashlib.sha256()
+    for path in (os.path.abspath(__file__),) + paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+class FragmentCache:
+    """
+    Rendered report fragments stored as files in cache_dir, keyed by a hash of the
+    fragment name, its inputs and the templates (and the `sources` rendering them).
+    None as cache_dir disables it. The cache_dir holds the fragments of one report,
+    so that prune() can drop those it no longer uses.
+    """
+
+    def __init__(self, cache_dir, sources=()):
+        self.cache_dir = cache_dir
+        self.version = source_hash(*sources)
+        self.hits = 0
+        self.misses = 0
+        self.used = set()
+
+    def render(self, name, inputs, render):
+        """Cached text of the fragment, or render() when its inputs changed."""
+        if self.cache_dir is None:
+            return render()
+        payload = json.dumps([self.version, name, inputs], sort_keys=True, ensure_ascii=False, default=str)
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        path = os.path.join(self.cache_dir, f"{name}-{key[:24]}.tex")
+        self.used.add(os.path.basename(path))
+        if os.path.exists(path):
+            self.hits += 1
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        self.misses += 1
+        text = render()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Report processes running in parallel may render the same fragment
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        return text
+
+    def prune(self):
+        """Remove the fragments not rendered since the cache was created (e.g. of an earlier date)."""
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return 0
+        unused = [name for name in os.listdir(self.cache_dir) if name not in self.used]
+        for name in unused:
+            os.remove(os.path.join(self.cache_dir, name))
+        return len(unused)
+
+def items(values, indent):
+    """itemize/enumerate entries, one per line."""
+    return "".join(f"{indent}\\item {value}\n" for value in values)
+
+PREAMBLE = Template(r"""
+\documentclass[a4paper,11pt]{article}
+\usepackage[utf8]{inputenc}
+\usepackage[T1]{fontenc}
+\usepackage{graphicx}
+\usepackage{hyperref}
+\usepackage{booktabs}
+\usepackage{geometry}
+\usepackage{longtable}
+\usepackage{xcolor}
+\usepackage{float}
+\usepackage{array}
+\usepackage{tikz}
+\usetikzlibrary{shapes.geometric, arrows, positioning}
+
+\geometry{margin=2.5cm}
+
+\hypersetup{
+    colorlinks=true,
+    linkcolor=blue,
+    filecolor=magenta,      
+    urlcolor=blue,
+}
+
+\title{<<title>>}
+\date{<<current_date>>}
+\renewcommand{\contentsname}{Spis treści}
+\renewcommand{\figurename}{Rycina}
+\renewcommand{\tablename}{Tabela}
+
+\begin{document}
+
+\maketitle
+
+<<abstract>>
+
+\tableofcontents
+\newpage
+
+""")
+
+METHODOLOGY = Template(r"""\section{<<methodology_section>>}
+<<methodology_text_1>>
+
+<<methodology_text_2>>
+\begin{itemize}
+<<bullets>>\end{itemize}
+
+<<methodology_process_intro>>
+
+\begin{enumerate}
+    \item \textbf{<<methodology_step1_title>>}: 
+    <<methodology_step1_desc>>
+    \begin{itemize}
+<<step1_criteria>>    \end{itemize}
+    
+    <<methodology_step1_genes_intro>> <<gene_list>>.
+    
+    <<methodology_step1_genes_rationale>>
+    
+    \item \textbf{<<methodology_step2_title>>}: 
+    <<step2_desc>>
+    
+    \item \textbf{<<methodology_step3_title>>}: 
+    <<methodology_step3_desc>>
+    \begin{itemize}
+<<step3_items>>    \end{itemize}
+
+    \item \textbf{<<methodology_step4_title>>}: 
+    <<methodology_step4_desc>>
+    \begin{itemize}
+<<step4_items>>    \end{itemize}
+
+    \item \textbf{<<methodology_step5_title>>}: 
+    <<methodology_step5_desc>>
+    \begin{itemize}
+<<step5_items>>    \end{itemize}
+\end{enumerate}
+
+\begin{figure}[H]
+\centering
+\begin{tikzpicture}[node distance=2cm]
+\tikzstyle{startstop} = [rectangle, rounded corners, minimum width=3cm, minimum height=1cm,text centered, draw=black, fill=red!30]
+\tikzstyle{process} = [rectangle, minimum width=3cm, minimum height=1cm, text centered, draw=black, fill=orange!30]
+\tikzstyle{decision} = [diamond, minimum width=3cm, minimum height=1cm, text centered, draw=black, fill=green!30]
+\tikzstyle{arrow} = [thick,->,>=stealth]
+
+\node (start) [startstop] {<<flowchart_start>> <<total_count>>};
+\node (date) [process, below of=start] {<<flowchart_date_filter>>};
+\node (size) [process, below of=date] {<<flowchart_size_filter>>};
+\node (syndrome) [process, below of=size] {<<flowchart_syndrome_filter>>};
+\node (final) [startstop, below of=syndrome, fill=green!30] {<<flowchart_final>> <<final_count>>};
+
+\node (rej_date) [process, right of=date, xshift=4cm, fill=gray!30] {<<flowchart_rejected>> <<date_rejected>>};
+\node (rej_size) [process, right of=size, xshift=4cm, fill=gray!30] {<<flowchart_rejected>> <<size_rejected>>};
+\node (rej_syndrome) [process, right of=syndrome, xshift=4cm, fill=gray!30] {<<flowchart_rejected>> <<syndrome_rejected>>};
+
+\draw [arrow] (start) -- (date);
+\draw [arrow] (date) -- (size);
+\draw [arrow] (size) -- (syndrome);
+\draw [arrow] (syndrome) -- (final);
+
+\draw [arrow] (date) -- (rej_date);
+\draw [arrow] (size) -- (rej_size);
+\draw [arrow] (syndrome) -- (rej_syndrome);
+
+\end{tikzpicture}
+\caption{<<flowchart_caption>>}
+\label{fig:flowchart}
+\end{figure}
+
+<<methodology_repo_link>>
+
+""")
+
+CONTRIBUTION = Template(r"""\section{<<contribution_section>>}
+<<contribution_intro>>
+
+\begin{itemize}
+<<contribution_items>>\end{itemize}
+
+\section{<<genes_section>>}
+""")
+
+GENE_TABLE = Template(r"""
+\subsection{<<subsection>>}
+<<description>>
+
+\begin{longtable}{|p{2cm}|p{2cm}|p{11cm}|}
+\hline
+\textbf{<<table_header_gene>>} & \textbf{<<table_header_omim>>} & \textbf{<<table_header_publications>>} \\
+\hline
+\endhead
+<<rows>>\end{longtable}
+""")
+
+STATS = Template(r"""
+\section{<<stats_section>>}
+<<stats_intro>>
+
+\subsection{<<stats_timeline_subsection>>}
+<<stats_timeline_intro>>
+
+\begin{figure}[H]
+    \centering
+    \includegraphics[width=0.9\textwidth]{<<timeline_chart>>}
+    \caption{<<stats_timeline_caption>>}
+    \label{fig:timeline}
+\end{figure}
+
+\subsection{<<stats_by_gene_subsection>>}
+<<stats_by_gene_intro>>
+
+\begin{figure}[H]
+    \centering
+    \includegraphics[width=0.9\textwidth]{<<by_gene_chart>>}
+    \caption{<<stats_by_gene_caption>>}
+    \label{fig:by_gene}
+\end{figure}
+
+\begin{longtable}{llr}
+\caption{<<stats_table_caption>>} \label{tab:stats} \\
+\toprule
+\textbf{<<table_header_lp>>} & \textbf{<<table_header_gene>>} & \textbf{<<table_header_count>>} \\
+\midrule
+\endfirsthead
+\caption[]{<<stats_table_caption>> (cd.)} \\
+\toprule
+\textbf{<<table_header_lp>>} & \textbf{<<table_header_gene>>} & \textbf{<<table_header_count>>} \\
+\midrule
+\endhead
+\midrule
+\multicolumn{3}{r}{{<<table_continued>>}} \\
+\midrule
+\endfoot
+\bottomrule
+\endlastfoot
+<<rows>>\midrule
+ & \textbf{<<table_sum>>} & \textbf{<<total>>} \\
+\end{longtable}
+
+\subsection{<<stats_by_classification_subsection>>}
+<<stats_by_classification_intro>>
+
+\begin{figure}[H]
+    \centering
+    \includegraphics[width=0.9\textwidth]{<<by_classification_chart>>}
+    \caption{<<stats_by_classification_caption>>}
+    \label{fig:by_classification}
+\end{figure}
+
+\subsection{<<stats_by_consequence_subsection>>}
+<<stats_by_consequence_intro>>
+
+\begin{figure}[H]
+    \centering
+    \includegraphics[width=0.9\textwidth]{<<by_consequence_chart>>}
+    \caption{<<stats_by_consequence_caption>>}
+    \label{fig:by_consequence}
+\end{figure}
+""")
+
+CENTERS = Template(r"""
+\subsection{<<centers_section>>}
+<<centers_desc>>
+
+<<centers_table_intro>>
+\begin{longtable}{lp{10cm}p{3cm}r}
+\caption{<<centers_table_caption>>} \label{tab:centers} \\
+\toprule
+\textbf{<<table_header_lp>>} & \textbf{<<table_header_submitter>>} & \textbf{<<table_header_country>>} & \textbf{<<table_header_count_short>>} \\
+\midrule
+\endfirsthead
+\caption[]{<<centers_table_caption>> (cd.)} \\
+\toprule
+\textbf{<<table_header_lp>>} & \textbf{<<table_header_submitter>>} & \textbf{<<table_header_country>>} & \textbf{<<table_header_count_short>>} \\
+\midrule
+\endhead
+\midrule
+\multicolumn{4}{r}{{<<table_continued>>}} \\
+\midrule
+\endfoot
+\bottomrule
+\endlastfoot
+<<rows>>\midrule
+ & \textbf{<<table_sum>>} & & \textbf{<<total>>} \\
+\end{longtable}
+""")
+
+COUNTRIES = Template(r"""\newpage 
+\subsection{<<country_stats_section>>}
+<<country_stats_desc>>
+
+\begin{figure}[H]
+    \centering
+    \includegraphics[width=0.9\textwidth]{<<by_country_chart>>}
+    \caption{<<country_stats_chart_caption>>}
+    \label{fig:by_country}
+\end{figure}
+
+<<country_stats_table_intro>>
+\begin{longtable}{llr}
+\caption{<<country_stats_table_caption>>} \label{tab:countries} \\
+\toprule
+\textbf{<<table_header_lp>>} & \textbf{<<table_header_country>>} & \textbf{<<table_header_count_submissions>>} \\
+\midrule
+\endfirsthead
+\caption[]{<<country_stats_table_caption>> (cd.)} \\
+\toprule
+\textbf{<<table_header_lp>>} & \textbf{<<table_header_country>>} & \textbf{<<table_header_count_submissions>>} \\
+\midrule
+\endhead
+<<rows>>\bottomrule
+\end{longtable}
+""")
+
+CLOSING = Template(r"""
+\vspace{2.5cm}
+\noindent Opracował: Tomasz Gambin
+
+\end{document}
+""")
@@ -0,0 +1,107 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from http_client import client
+
+METRICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "metrics")
+# Set by run_pipeline.py so that the stage processes of one run report together
+METRICS_DIR_ENV = "PIPELINE_METRICS_DIR"
+# Name of a stage to profile with cProfile (also settable with --profile)
+PROFILE_ENV = "PIPELINE_PROFILE_STAGE"
+
+def peak_rss_mb(who=None):
+    """Peak resident set size of this process (or of its waited-for children) in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class MetricsRecorder:
+    """
+    Per-stage wall/CPU time, peak RSS, row counts and HTTP statistics of one
+    process, written as JSON by save().
+    """
+
+    def __init__(self):
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.stages = []
+        self.lock = threading.Lock()
+        self.profile_stage = os.environ.get(PROFILE_ENV)
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Measure the enclosed block as stage `name`. Yields the stage record, in which
+        the block can set "rows_out" (and other counters).
+        """
+        record = {"stage": name, "rows_in": rows_in, "rows_out": None}
+        http_mark = client.mark()
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                record["profile"] = self.dump_profile(profiler, name)
+            record["wall_s"] = round(time.perf_counter() - wall_start, 4)
+            record["cpu_s"] = round(time.process_time() - cpu_start, 4)
+            record["peak_rss_mb"] = peak_rss_mb()
+            record["http"] = client.report(since=http_mark)
+            with self.lock:
+                self.stages.append(record)
+
+    def dump_profile(self, profiler, name):
+        """Write a cProfile (pstats) dump of the stage; returns its path."""
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"profile-{name}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        profiler.dump_stats(path)
+        print(f"Profile of stage {name} saved to {path}")
+        return path
+
+    def to_dict(self, process):
+        return {
+            "process": process,
+            "started": self.started,
+            "argv": sys.argv,
+            "python": sys.version.split()[0],
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+            "http": client.report(),
+        }
+
+    def save(self, process, path=None):
+        """
+        Write the metrics of this process as JSON and return the path. Inside a
+        run_pipeline.py run the file goes to the run's directory, otherwise to
+        cache/metrics/<date>-<process>.json.
+        """
+        if path is None:
+            run_dir = os.environ.get(METRICS_DIR_ENV)
+            if run_dir:
+                path = os.path.join(run_dir, f"{process}.json")
+            else:
+                path = os.path.join(METRICS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{process}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(process), f, indent=4)
+        os.replace(tmp_path, path)
+        return path
+
+# Shared by all modules of the process
+recorder = MetricsRecorder()
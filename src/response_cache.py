@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+class ResponseCache:
+    """
+    On-disk cache of raw API responses, keyed by a hash of the endpoint and request
+    parameters. Responses are stored gzip-compressed under cache_dir. Entries older
+    than ttl seconds are refetched (except in offline mode) and the least recently
+    used entries are evicted once the cache grows past max_size bytes.
+    """
+
+    def __init__(self, cache_dir, ttl=None, max_size=None, offline=False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.oldest_hit = None  # Storage time of the oldest entry served
+
+    def key(self, endpoint, params):
+        """Content address of a request."""
+        payload = json.dumps([endpoint, {k: str(v) for k, v in params.items()}], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.gz")
+
+    def get(self, endpoint, params):
+        """Return cached content for a request, or None if missing or expired."""
+        path = self.path(self.key(endpoint, params))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        if self.ttl is not None and not self.offline and time.time() - stat.st_mtime > self.ttl:
+            self.misses += 1
+            return None
+        with gzip.open(path, "rb") as f:
+            content = f.read()
+        # Record the access time for LRU eviction, keeping the stored time in mtime
+        os.utime(path, (time.time(), stat.st_mtime))
+        self.hits += 1
+        if self.oldest_hit is None or stat.st_mtime < self.oldest_hit:
+            self.oldest_hit = stat.st_mtime
+        return content
+
+    def put(self, endpoint, params, content):
+        """Store response content for a request."""
+        path = self.path(self.key(endpoint, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Remove expired entries, then least recently used ones until under max_size."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        entries = []
+        now = time.time()
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                stat = os.stat(path)
+                if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+        if self.max_size is not None:
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                os.remove(path)
+                total -= size
+                removed += 1
+        return removed
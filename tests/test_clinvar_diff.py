@@ -0,0 +1,107 @@
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+import clinvar_diff
+from clinvar_diff import CHANGE_KINDS, CHANGELOG_FIELDS, diff_snapshots
+
+COLUMNS = ["Gene", "Phenotype", "Classification", "Variant (HGVS)", "Date Created", "Submitter", "Consequence",
+           "Review Status", "Variation ID", "VCV Accession", "Submission Accession", "Submission Version"]
+
+def row(gene, vcv, scv, phenotype="Disease", classification="Pathogenic", date="2023-01-01", submitter="Lab",
+        review_status="criteria provided", version="1"):
+    return {"Gene": gene, "Phenotype": phenotype, "Classification": classification,
+            "Variant (HGVS)": f"{vcv} change", "Date Created": date, "Submitter": submitter,
+            "Consequence": "missense variant", "Review Status": review_status,
+            "Variation ID": vcv.lstrip("VCV"), "VCV Accession": vcv, "Submission Accession": scv,
+            "Submission Version": version}
+
+def write_snapshot(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+OLD = [
+    row("A", "VCV1", "SCV1"),
+    row("A", "VCV1", "SCV2", classification="Likely pathogenic"),
+    row("A", "VCV2", "SCV3", date="2022-05-01"),
+    row("A", "VCV2", "SCV4", review_status="no assertion criteria provided"),
+    row("B", "VCV3", "SCV5", phenotype="Disease 1"),
+    row("B", "VCV3", "SCV5", phenotype="Disease 2"),
+    row("B", "VCV4", "SCV6"),
+    row("B", "VCV5", "N/A", submitter="Lab 1"),
+    row("B", "VCV5", "", submitter="Lab 2", classification="Likely pathogenic"),
+]
+NEW = [
+    row("A", "VCV1", "SCV1"),
+    # Differs only in case, which ClinVar is not consistent about
+    row("A", "VCV1", "SCV2", classification="Likely Pathogenic"),
+    row("A", "VCV2", "SCV3", date="2022-06-01"),
+    row("A", "VCV2", "SCV4", review_status="criteria provided"),
+    # The same phenotypes, in another row order
+    row("B", "VCV3", "SCV5", phenotype="Disease 2"),
+    row("B", "VCV3", "SCV5", phenotype="Disease 1"),
+    row("B", "VCV3", "SCV5", phenotype="Disease 3"),
+    row("B", "VCV4", "SCV7"),
+    row("B", "VCV5", "N/A", submitter="Lab 1", classification="Likely pathogenic"),
+    row("B", "VCV5", "N/A", submitter="Lab 2", classification="Likely pathogenic"),
+]
+EXPECTED = {
+    ("date_changed", "SCV3", "Date Created", "2022-05-01", "2022-06-01"),
+    ("metadata_changed", "SCV4", "Review Status", "no assertion criteria provided", "criteria provided"),
+    ("metadata_changed", "SCV5", "Phenotype", "Disease 1; Disease 2", "Disease 1; Disease 2; Disease 3"),
+    ("removed", "SCV6", "Classification", "Pathogenic", ""),
+    ("added", "SCV7", "Classification", "", "Pathogenic"),
+    # Submissions without an SCV are keyed by variant and submitter
+    ("reclassified", "VCV5|Lab 1", "Classification", "Pathogenic", "Likely pathogenic"),
+}
+
+def run_diff(tmp_path, partitions, old=OLD, new=NEW):
+    old_path = write_snapshot(tmp_path / "old.csv", old)
+    new_path = write_snapshot(tmp_path / "new.csv", new)
+    base = str(tmp_path / f"changes_{partitions}")
+    summary, samples = diff_snapshots(old_path, new_path, base, partitions=partitions)
+    with open(base + ".csv", newline="", encoding="utf-8") as f:
+        changes = list(csv.DictReader(f))
+    with open(base + ".json", encoding="utf-8") as f:
+        assert json.load(f)["changes"] == summary["changes"]
+    return summary, changes
+
+def change_set(changes):
+    return {(c["Change"], c["Submission Accession"], c["Field"], c["Old"], c["New"]) for c in changes}
+
+@pytest.mark.parametrize("partitions", [1, 3])
+def test_change_kinds(tmp_path, partitions):
+    summary, changes = run_diff(tmp_path, partitions)
+    assert list(changes[0]) == CHANGELOG_FIELDS
+    assert change_set(changes) == EXPECTED
+    assert summary["changes"] == {"added": 1, "removed": 1, "reclassified": 1, "date_changed": 1,
+                                  "metadata_changed": 2}
+    assert summary["submissions"] == {"old": 8, "new": 8}
+    assert summary["by_gene"]["A"] == dict(zip(CHANGE_KINDS, [0, 0, 0, 1, 1]))
+
+def test_partitions_give_the_same_changes(tmp_path, monkeypatch):
+    # Flushes the spool buffers every few rows
+    monkeypatch.setattr(clinvar_diff, "SPOOL_ROWS", 2)
+    old = OLD + [row("C", f"VCV{i}", f"SCV{i}") for i in range(10, 40)]
+    new = NEW + [row("C", f"VCV{i}", f"SCV{i}", date="2024-01-01" if i % 3 else "2023-01-01")
+                 for i in range(10, 40)]
+    _, single = run_diff(tmp_path, 1, old, new)
+    for partitions in (2, 7):
+        _, partitioned = run_diff(tmp_path, partitions, old, new)
+        assert sorted(map(tuple, (c.values() for c in partitioned))) == \
+            sorted(map(tuple, (c.values() for c in single)))
+    assert change_set(single) >= EXPECTED
+
+def test_unchanged_snapshot(tmp_path):
+    summary, changes = run_diff(tmp_path, 2, OLD, OLD)
+    assert changes == []
+    assert summary["changes"] == dict.fromkeys(CHANGE_KINDS, 0)
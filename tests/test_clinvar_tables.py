@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from clinvar_tables import flat_view, normalize, read_results, write_results
+from dataset_io import SCHEMA, apply_schema
+
+def row(gene, vcv, scv, phenotype="Disease", classification="Pathogenic", submitter="Lab", date="2023-01-01"):
+    return {"Gene": gene, "Phenotype": phenotype, "Classification": classification,
+            "Variant (HGVS)": f"{vcv} change", "Date Created": date, "Submitter": submitter,
+            "Consequence": "missense variant", "Review Status": "criteria provided",
+            "Variation ID": vcv.lstrip("VCV"), "VCV Accession": vcv, "Submission Accession": scv,
+            "Submission Version": "1"}
+
+def results(rows):
+    df = pd.DataFrame(rows)
+    # In the column order of the flat export, as flat_view returns them
+    return apply_schema(df[[column for column in SCHEMA if column in df.columns]])
+
+def assert_same_rows(left, right):
+    # The categories of a categorical column depend on the rows it was built from
+    pd.testing.assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True), check_categorical=False)
+
+def assert_round_trip(df, genes=None):
+    expected = df if genes is None else df[df['Gene'].isin(genes)]
+    assert_same_rows(flat_view(normalize(df), genes), expected)
+
+def test_round_trip():
+    assert_round_trip(results([
+        row("A", "VCV1", "SCV1", "Disease 1"), row("A", "VCV1", "SCV1", "Disease 2"),
+        row("A", "VCV1", "SCV2"), row("A", "VCV2", "SCV3"), row("B", "VCV3", "SCV4"),
+    ]))
+
+@pytest.mark.parametrize("accession", ["N/A", None])
+def test_missing_accessions_of_different_variants(accession):
+    assert_round_trip(results([row("A", "VCV1", accession), row("A", "VCV2", accession, submitter="Other")]))
+
+@pytest.mark.parametrize("accession", ["N/A", None])
+def test_missing_accessions_of_one_variant(accession):
+    assert_round_trip(results([
+        row("A", "VCV1", accession, "Disease 1"), row("A", "VCV1", accession, "Disease 2"),
+        row("A", "VCV1", "SCV1"), row("A", "VCV1", accession, submitter="Other"),
+    ]))
+
+def test_variant_of_several_genes_is_stored_once():
+    df = results([row("A", "VCV1", "SCV1"), row("A", "VCV1", "SCV2"),
+                  row("B", "VCV1", "SCV1"), row("B", "VCV1", "SCV2")])
+    tables = normalize(df)
+    assert len(tables["variants"]) == 1
+    assert len(tables["submissions"]) == 2
+    assert_round_trip(df)
+    assert_round_trip(df, genes=["B"])
+
+def test_variant_with_different_copies_per_gene():
+    # Gene B was refreshed on its own and has a newer classification of the variant
+    df = results([row("A", "VCV1", "SCV1"), row("A", "VCV1", "SCV2"),
+                  row("B", "VCV1", "SCV1", classification="Likely pathogenic"), row("B", "VCV1", "SCV2"),
+                  row("C", "VCV1", "SCV1"), row("C", "VCV1", "SCV2")])
+    assert len(normalize(df)["variants"]) == 2
+    assert_round_trip(df)
+    assert_round_trip(df, genes=["B", "C"])
+
+def test_write_and_read(tmp_path):
+    df = results([row("A", "VCV1", "SCV1"), row("A", "VCV2", "N/A"), row("B", "VCV1", "SCV1")])
+    base_path = str(tmp_path / "clinvar_results")
+    write_results(df, base_path)
+    assert_same_rows(read_results(base_path), df)
+    assert_same_rows(read_results(base_path, genes=["B"], columns=["Gene", "Submission Accession"]),
+                     df.loc[[2], ["Gene", "Submission Accession"]])
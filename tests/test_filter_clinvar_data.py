@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from filter_clinvar_data import filter_frame, parse_variant_size, variant_coordinates, variant_sizes
+
+SIZES = {
+    "GRCh37/hg19 22q11.21(chr22:18912231-21465672)x1": 2553441,
+    "NC_000023.11:g.200_100del": 100,
+    "NC_000001.11:g.(100_200)_(500_600)del": 300,
+    # Inner bounds overlap
+    "NC_000001.11:g.(100_600)_(500_900)del": 0,
+    # Three numbers: the size is given by the known inner bounds
+    "NC_000001.11:g.(?_100)_(500_900)del": 400,
+    "NC_000001.11:g.(100_200)_(500_?)del": 300,
+    "NC_000001.11:g.(100_?)_(500_600)del": 0,
+    "NM_000001.1(ABC):c.123A>G (p.Lys41Arg)": 0,
+}
+
+@pytest.mark.parametrize("name, size", SIZES.items())
+def test_variant_size(name, size):
+    assert parse_variant_size(name) == size
+
+def test_vectorized_sizes():
+    names = pd.Series(list(SIZES) + [None])
+    assert list(variant_sizes(names)) == list(SIZES.values()) + [0]
+
+def test_coordinates():
+    names = [
+        "GRCh37/hg19 22q11.21(chr22:18912231-21465672)x1",
+        "NC_000022.11:g.(?_19000000)_(20000000_?)del",
+        "NC_000016.9:g.(29000000_29652999)_(30199351_30500000)dup",
+        "NC_000023.11:g.200_100del",
+        # Not a version of GRCh37 or GRCh38
+        "NC_000022.5:g.100_200del",
+        "NC_000001.11:g.(100_?)_(500_600)del",
+        "NM_000001.1(ABC):c.123A>G (p.Lys41Arg)",
+        None,
+    ]
+    coords = variant_coordinates(pd.Series(names))
+    assert list(coords.columns) == ["Assembly", "Chromosome", "Start", "End", "Min Size", "Max Size"]
+    na = pd.NA
+    expected = [
+        ("GRCh37", "22", 18912231, 21465672, 2553441, 2553441),
+        ("GRCh38", "22", 19000000, 20000000, 1000000, na),
+        ("GRCh37", "16", 29652999, 30199351, 546352, 1500000),
+        ("GRCh38", "X", 100, 200, 100, 100),
+        (na, "22", 100, 200, 100, 100),
+        ("GRCh38", "1", na, na, na, 500),
+        (na, na, na, na, na, na),
+        (na, na, na, na, na, na),
+    ]
+    rows = [tuple(na if pd.isna(value) else value for value in row) for row in coords.itertuples(index=False)]
+    assert rows == expected
+
+REGIONS = [
+    {"name": "22q11.2 LCR22A-D", "assembly": "GRCh37", "chromosome": "22", "start": 18912231, "end": 21465672},
+    {"name": "16p11.2 BP4-BP5", "assembly": "GRCh38", "chromosome": "16", "start": 29641678, "end": 30188030},
+]
+
+def results(names):
+    return pd.DataFrame({"Gene": "A", "Phenotype": "Disease", "Classification": "Pathogenic",
+                         "Variant (HGVS)": names, "Date Created": "2023-05-01"})
+
+def regions(action):
+    return [dict(r, action=action) for r in REGIONS]
+
+NAMES = [
+    # Inside 22q11.2 on GRCh37, small enough for the size filter
+    "GRCh37/hg19 22q11.21(chr22:19000000-19100000)x1",
+    # Touches the end of 16p11.2 on GRCh38
+    "NC_000016.10:g.30188030_30190000del",
+    # The same GRCh38 coordinates on GRCh37
+    "NC_000016.9:g.30188030_30190000del",
+    "NM_000001.1(ABC):c.123A>G (p.Lys41Arg)",
+]
+
+def test_tagged_regions_are_kept():
+    kept, rejected = filter_frame(results(NAMES), 500000, [], regions=regions("tag"))
+    assert rejected.empty
+    assert list(kept['Recurrent Region']) == ["22q11.2 LCR22A-D", "16p11.2 BP4-BP5", None, None]
+
+def test_excluded_regions_are_rejected():
+    kept, rejected = filter_frame(results(NAMES), 500000, [], regions=regions("exclude"))
+    assert list(kept['Variant (HGVS)']) == NAMES[2:]
+    assert list(rejected['Rejection Reason']) == ["Recurrent Region: 22q11.2 LCR22A-D",
+                                                  "Recurrent Region: 16p11.2 BP4-BP5"]
+    assert list(rejected['Recurrent Region']) == ["22q11.2 LCR22A-D", "16p11.2 BP4-BP5"]
+
+def test_earlier_filters_take_precedence():
+    df = results(NAMES[:2])
+    df.loc[1, 'Date Created'] = "2019-01-01"
+    _, rejected = filter_frame(df, 50000, [], regions=regions("exclude"))
+    assert list(rejected['Rejection Reason']) == ["Large Genomic Event (>500kb): 100000 bp",
+                                                  "Date out of range: 2019"]
@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from genomic_intervals import IntervalIndex
+
+def region(name, start, end, chromosome="1", assembly="GRCh38"):
+    return {"name": name, "assembly": assembly, "chromosome": chromosome, "start": start, "end": end}
+
+def names(regions):
+    return sorted(r["name"] for r in regions)
+
+@pytest.mark.parametrize("start, end, expected", [
+    # Both ends are inclusive
+    (200, 300, ["A"]),
+    (201, 300, []),
+    (50, 100, ["A"]),
+    (50, 99, []),
+    (100, 200, ["A"]),
+    (150, 150, ["A"]),
+])
+def test_touching_ends(start, end, expected):
+    index = IntervalIndex([region("A", 100, 200)])
+    assert names(index.overlapping("GRCh38", "1", start, end)) == expected
+
+def test_nested_regions():
+    index = IntervalIndex([region("outer", 100, 1000), region("inner", 200, 300)])
+    assert names(index.overlapping("GRCh38", "1", 250, 260)) == ["inner", "outer"]
+    assert names(index.overlapping("GRCh38", "1", 500, 600)) == ["outer"]
+    assert names(index.overlapping("GRCh38", "1", 50, 2000)) == ["inner", "outer"]
+
+def test_running_max_end():
+    # B and C end before the query, but A (starting before them) reaches it
+    index = IntervalIndex([region("B", 200, 300), region("A", 100, 1000), region("C", 400, 500)])
+    assert names(index.overlapping("GRCh38", "1", 600, 700)) == ["A"]
+    assert names(index.overlapping("GRCh38", "1", 350, 360)) == ["A"]
+    assert names(index.overlapping("GRCh38", "1", 450, 450)) == ["A", "C"]
+    assert names(index.overlapping("GRCh38", "1", 1001, 1100)) == []
+
+def test_assembly_and_chromosome():
+    index = IntervalIndex([region("A", 100, 200, chromosome=22), region("B", 100, 200, chromosome="22", assembly="GRCh37")])
+    assert names(index.overlapping("GRCh38", "22", 150, 150)) == ["A"]
+    assert names(index.overlapping("GRCh37", 22, 150, 150)) == ["B"]
+    assert index.overlapping("GRCh38", "X", 150, 150) == []
+
+def test_random_regions():
+    rng = random.Random(0)
+    regions = []
+    for i in range(300):
+        start = rng.randint(0, 10000)
+        regions.append(region(f"R{i}", start, start + rng.choice([0, 5, 50, 500, 5000]),
+                              chromosome=rng.choice(["1", "2"])))
+    index = IntervalIndex(regions)
+    for _ in range(500):
+        chromosome = rng.choice(["1", "2"])
+        start = rng.randint(0, 11000)
+        end = start + rng.choice([0, 10, 1000])
+        expected = [r["name"] for r in regions
+                    if r["chromosome"] == chromosome and r["start"] <= end and r["end"] >= start]
+        assert names(index.overlapping("GRCh38", chromosome, start, end)) == sorted(expected)
+
+def test_annotate():
+    index = IntervalIndex([region("A", 100, 200), region("B", 150, 300)])
+    assert index.annotate(["GRCh38", "GRCh38", "GRCh38", None], ["1", "1", "1", "1"],
+                          [160, 250, 400, 160], [170, 260, 500, 170]) == ["A; B", "B", None, None]
@@ -0,0 +1,59 @@
+import gzip
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+sys.path.append(os.path.join(BASE_DIR, "benchmarks"))
+
+from dataset_io import read_csv
+from fetch_clinvar_data import GENES, parse_archive
+from ingest_clinvar_release import ingest_release, iter_archive_chunks
+from synthetic_data import DEFAULT_INPUT, archive_xml, synthetic_results, vcv_xml
+
+# A variant listed under two of the configured genes and one that is not configured
+SHARED_VARIANT = 10 ** 9
+SHARED_GENES = ["TBX4", "OTHER1", "FOXF1"]
+
+@pytest.fixture(scope="module")
+def release(tmp_path_factory):
+    """Small gzipped release file built from two copies of the fetched results."""
+    results = synthetic_results(read_csv(DEFAULT_INPUT), 2)
+    xml = vcv_xml(results)
+    rows = results[results['Gene'] == "TBX4"].head(3).to_dict("records")
+    shared = archive_xml(SHARED_VARIANT, rows, SHARED_GENES).encode("utf-8")
+    xml = xml.replace(b"</ClinVarResult-Set>", shared + b"\n</ClinVarResult-Set>")
+    path = str(tmp_path_factory.mktemp("release") / "ClinVarVCVRelease_test.xml.gz")
+    with gzip.open(path, "wb") as f:
+        f.write(xml)
+    return path, xml
+
+def expected_rows(xml):
+    """Rows of parse_archive for each configured gene of each archive, grouped by gene."""
+    archives = ET.fromstring(xml).findall("VariationArchive")
+    by_gene = {gene: [] for gene in GENES}
+    for archive in archives:
+        for gene in archive.iterfind("ClassifiedRecord/SimpleAllele/GeneList/Gene"):
+            if gene.get("Symbol") in by_gene:
+                by_gene[gene.get("Symbol")].extend(parse_archive(archive, gene.get("Symbol")))
+    return [tuple(row) for gene in GENES for row in by_gene[gene]]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingest_matches_parse_archive(release, workers):
+    path, xml = release
+    rows = [tuple(row) for row in ingest_release(path, GENES, workers=workers)]
+    assert rows == expected_rows(xml)
+
+def test_variant_of_several_genes(release):
+    path, _ = release
+    rows = [row for row in ingest_release(path, GENES, workers=1) if row.variation_id == str(SHARED_VARIANT)]
+    assert {row.gene for row in rows} == {"TBX4", "FOXF1"}
+    assert len(rows) == 2 * 3
+
+def test_chunks_across_blocks(release):
+    path, _ = release
+    # Start and end tags are split across the small blocks
+    assert list(iter_archive_chunks(path, block_size=7)) == list(iter_archive_chunks(path))
@@ -0,0 +1,95 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, "src"))
+
+from dataset_io import read_csv
+from keyword_matcher import KeywordMatcher, load_matcher, normalize_text
+
+def first_keyword(keywords, text, normalize=False):
+    """The first-keyword-wins semantics the matcher replaces."""
+    if normalize:
+        keywords, text = [normalize_text(k) for k in keywords], normalize_text(text)
+    return next((i for i, keyword in enumerate(keywords) if keyword in text), None)
+
+def assert_matches(keywords, texts, normalize=False):
+    matcher = KeywordMatcher(keywords, normalize)
+    for text in texts:
+        index = first_keyword(keywords, text, normalize)
+        assert matcher.first_index(text) == index, text
+        assert matcher.first_match(text) == (None if index is None else keywords[index])
+
+@pytest.mark.parametrize("keywords, text, expected", [
+    # A later-listed keyword ending earlier in the text does not win
+    (["bcd", "ab"], "abcd", "bcd"),
+    (["abcd", "bc"], "xabcdx", "abcd"),
+    # Matches found through failure links (suffixes of the current state)
+    (["he", "she", "his", "hers"], "ushers", "he"),
+    (["c", "abc"], "abc", "c"),
+    (["abc", "c"], "abd c", "c"),
+    (["aab", "ab"], "aaab", "aab"),
+    # Overlapping keywords sharing a prefix
+    (["syndrome x", "syndrome"], "a syndrome", "syndrome"),
+    (["deletion", "del"], "microdeletion", "deletion"),
+    (["xyz"], "abc", None),
+    (["", "a"], "b", ""),
+])
+def test_first_listed_keyword(keywords, text, expected):
+    assert KeywordMatcher(keywords).first_match(text) == expected
+    assert_matches(keywords, [text])
+
+def test_random_keywords():
+    rng = random.Random(0)
+    for _ in range(200):
+        keywords = ["".join(rng.choices("ab c", k=rng.randint(1, 4))) for _ in range(rng.randint(1, 8))]
+        texts = ["".join(rng.choices("ab c", k=rng.randint(0, 12))) for _ in range(20)]
+        assert_matches(keywords, texts)
+        assert_matches(keywords, texts, normalize=True)
+
+def test_normalized_mode():
+    keywords = ["Microdeletion  Syndrome", "DUPLICATION"]
+    matcher = KeywordMatcher(keywords, normalize=True)
+    assert matcher.first_match("16p11.2 microdeletion\tsyndrome") == "Microdeletion  Syndrome"
+    assert matcher.first_match("Xq28 Duplication") == "DUPLICATION"
+    assert matcher.first_match("micro deletion") is None
+    # The default mode is case- and whitespace-sensitive
+    assert KeywordMatcher(keywords).first_match("Xq28 Duplication") is None
+    assert_matches(keywords, ["MICRODELETION SYNDROME", "microdeletion\n\nsyndrome 2", "duplication"], normalize=True)
+
+def test_configured_keywords_on_fetched_phenotypes():
+    with open(os.path.join(BASE_DIR, "config", "filtering.json")) as f:
+        keywords = json.load(f)["exclude_keywords"]
+    phenotypes = read_csv(os.path.join(BASE_DIR, "cache", "clinvar_results.csv"))['Phenotype'].dropna().unique()
+    texts = [str(phenotype) for phenotype in phenotypes]
+    assert_matches(keywords, texts)
+    assert_matches(keywords, texts, normalize=True)
+
+def test_cache_rebuilt_when_keywords_or_mode_change(tmp_path):
+    cache_path = str(tmp_path / "keyword_matcher.pkl")
+    matcher = load_matcher(["deletion", "duplication"], cache_path=cache_path)
+    assert os.path.exists(cache_path)
+    mtime = os.stat(cache_path).st_mtime_ns
+
+    cached = load_matcher(["deletion", "duplication"], cache_path=cache_path)
+    assert cached.keywords == matcher.keywords and os.stat(cache_path).st_mtime_ns == mtime
+    assert cached.first_match("a duplication") == "duplication"
+
+    rebuilt = load_matcher(["duplication", "deletion"], cache_path=cache_path)
+    assert rebuilt.keywords == ["duplication", "deletion"]
+    assert rebuilt.first_match("deletion and duplication") == "duplication"
+
+    normalized = load_matcher(["duplication", "deletion"], normalize=True, cache_path=cache_path)
+    assert normalized.normalize and normalized.first_match("DELETION") == "deletion"
+    assert not load_matcher(["duplication", "deletion"], cache_path=cache_path).normalize
+
+def test_corrupt_cache_is_rebuilt(tmp_path):
+    cache_path = tmp_path / "keyword_matcher.pkl"
+    cache_path.write_bytes(b"not a pickle")
+    matcher = load_matcher(["deletion"], cache_path=str(cache_path))
+    assert matcher.first_match("deletion") == "deletion"
+    assert load_matcher(["deletion"], cache_path=str(cache_path)).keywords == ["deletion"]